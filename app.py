@@ -13,17 +13,29 @@ Features included:
 """
 import os
 import io
+import csv
+import base64
+import hmac
 import hashlib
+import shutil
 import socket
+import subprocess
+import tempfile
 import logging
-from datetime import datetime, timedelta
-from functools import wraps
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from functools import lru_cache, wraps
+from itertools import islice
 
-import pandas as pd
+import numpy as np
 import cv2
+import xlsxwriter
 from flask import (
     Flask, request, jsonify, render_template, redirect, url_for, session,
-    flash, Response, send_file
+    flash, Response, send_file, send_from_directory, abort
 )
 
 # -------------------
@@ -32,6 +44,25 @@ from flask import (
 app = Flask(__name__)
 app.secret_key = os.environ.get("APP_SECRET", "AmanUltraSecretKey")
 app.permanent_session_lifetime = timedelta(minutes=25)
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = timedelta(hours=12)
+# Sessions expire 25 minutes after login; don't re-sign the session on every request
+app.config["SESSION_REFRESH_EACH_REQUEST"] = False
+
+# Optional server-side sessions in Redis (defensive, falls back to signed cookies)
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    try:
+        import redis
+        from flask_session import Session
+        app.config.update(
+            SESSION_TYPE="redis",
+            SESSION_REDIS=redis.Redis.from_url(REDIS_URL),
+            SESSION_USE_SIGNER=True,
+            SESSION_PERMANENT=True,
+        )
+        Session(app)
+    except Exception as e:
+        logging.getLogger("ai-attendance").warning(f"Redis sessions unavailable, using cookies: {e}")
 
 # -------------------
 # Config / Files
@@ -40,6 +71,9 @@ ATTENDANCE_FILE = "attendance.csv"
 USERS_FILE = "users.csv"
 TASKS_LOCAL = "tasks_local.csv"
 
+# Max documents fetched per Firestore query
+PAGE_SIZE = 50
+
 ADMIN_USER = "admin"
 ADMIN_PASS = "1234"
 
@@ -47,6 +81,8 @@ camera = None
 USE_FIREBASE = False
 db = None
 FIREBASE_ERROR = None
+_ATTENDANCE_LOCK = threading.Lock()
+_TASKS_LOCK = threading.Lock()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ai-attendance")
@@ -57,22 +93,38 @@ logger = logging.getLogger("ai-attendance")
 try:
     import firebase_admin
     from firebase_admin import credentials, firestore
-    possible_keys = ["firebase_key.json", "firebase_key.json", "firebase_key.json"]
-    found_key = next((k for k in possible_keys if os.path.exists(k)), None)
-    if found_key:
-        cred = credentials.Certificate(found_key)
-        if not firebase_admin._apps:
-            firebase_admin.initialize_app(cred)
-        db = firestore.client()
-        USE_FIREBASE = True
-        FIREBASE_ERROR = None
-    else:
-        FIREBASE_ERROR = "No firebase_key.json found"
-        USE_FIREBASE = False
 except Exception as e:
+    firebase_admin = None
     FIREBASE_ERROR = str(e)
-    USE_FIREBASE = False
-    db = None
+
+def init_firebase(reinit=False):
+    """Open this process's Firestore client. reinit=True is for forked workers
+    (gunicorn post_fork) so they never reuse the parent's gRPC channel."""
+    global db, USE_FIREBASE, FIREBASE_ERROR
+    if firebase_admin is None:
+        return
+    try:
+        possible_keys = ["firebase_key.json", "firebase_key.json", "firebase_key.json"]
+        found_key = next((k for k in possible_keys if os.path.exists(k)), None)
+        if found_key:
+            if reinit and firebase_admin._apps:
+                firebase_admin.delete_app(firebase_admin.get_app())
+            cred = credentials.Certificate(found_key)
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app(cred)
+            # The one Firestore client for the process; handlers reuse its gRPC channel.
+            db = firestore.client()
+            USE_FIREBASE = True
+            FIREBASE_ERROR = None
+        else:
+            FIREBASE_ERROR = "No firebase_key.json found"
+            USE_FIREBASE = False
+    except Exception as e:
+        FIREBASE_ERROR = str(e)
+        USE_FIREBASE = False
+        db = None
+
+init_firebase()
 
 # -------------------
 # Utilities
@@ -84,67 +136,177 @@ def get_ip():
         return "Unknown"
 
 def hash_password(pwd: str) -> str:
-    return hashlib.sha256(pwd.encode()).hexdigest()
+    """SHA-256 of the password, stored base64-encoded (44 chars instead of 64 hex)."""
+    return base64.b64encode(hashlib.sha256(pwd.encode("utf-8", "surrogatepass")).digest()).decode("ascii")
+
+def verify_password(pwd: str, stored: str) -> bool:
+    """Constant-time check against a stored hash; also accepts legacy hex digests."""
+    if not stored:
+        return False
+    if len(stored) == 64:
+        candidate = hashlib.sha256(pwd.encode("utf-8", "surrogatepass")).hexdigest()
+    else:
+        candidate = hash_password(pwd)
+    return hmac.compare_digest(candidate, stored)
+
+ADMIN_PASS_HASH = hash_password(ADMIN_PASS)
+
+def is_admin(u: str, pwd: str) -> bool:
+    return hmac.compare_digest(hash_password(pwd), ADMIN_PASS_HASH) and u == ADMIN_USER
 
 def ensure_files():
-    if not os.path.exists(ATTENDANCE_FILE):
-        pd.DataFrame(columns=["Name", "Date", "Time"]).to_csv(ATTENDANCE_FILE, index=False)
-    if not os.path.exists(USERS_FILE):
-        pd.DataFrame(columns=["Username", "FullName", "Password", "Created"]).to_csv(USERS_FILE, index=False)
-    if not os.path.exists(TASKS_LOCAL):
-        pd.DataFrame(columns=["user", "task", "status", "date", "time", "created"]).to_csv(TASKS_LOCAL, index=False)
+    headers = {
+        ATTENDANCE_FILE: ["Name", "Date", "Time"],
+        USERS_FILE: ["Username", "FullName", "Password", "Created"],
+        TASKS_LOCAL: ["user", "task", "status", "date", "time", "created"],
+    }
+    for path, columns in headers.items():
+        if not os.path.exists(path):
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(columns)
 
 ensure_files()
 
+USER_FIELDS = ["Username", "FullName", "Password", "Created"]
+_USERS_CACHE = {}
+_USERS_MTIME = None
+
 def safe_read_users():
+    """Return {username: {"FullName", "Password", "Created"}}, reloaded only when users.csv changes."""
+    global _USERS_CACHE, _USERS_MTIME
     try:
-        if not os.path.exists(USERS_FILE):
-             return pd.DataFrame(columns=["Username", "FullName", "Password", "Created"])
-        df = pd.read_csv(USERS_FILE)
-        # Drop empty or corrupted rows
-        df = df.dropna(subset=["Username"])
-        # Ensure we only have the latest record for each user if duplicates exist
-        df = df.drop_duplicates(subset=["Username"], keep="last")
-        
-        expected = ["Username", "FullName", "Password", "Created"]
-        for c in expected:
-            if c not in df.columns:
-                df[c] = ""
-        return df[expected]
-    except pd.errors.EmptyDataError:
-        return pd.DataFrame(columns=["Username","FullName","Password","Created"])
+        mtime = os.stat(USERS_FILE).st_mtime
+    except OSError:
+        _USERS_CACHE, _USERS_MTIME = {}, None
+        return _USERS_CACHE
+    if mtime == _USERS_MTIME:
+        return _USERS_CACHE
+    users = {}
+    try:
+        with open(USERS_FILE, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                uname = (row.get("Username") or "").strip()
+                # Skip empty or corrupted rows
+                if not uname:
+                    continue
+                # Later rows win, so the latest record for a duplicated user is kept
+                users[uname] = {c: row.get(c) or "" for c in USER_FIELDS[1:]}
     except Exception:
         logger.exception("Failed reading users file")
-        return pd.DataFrame(columns=["Username","FullName","Password","Created"])
+    _USERS_CACHE, _USERS_MTIME = users, mtime
+    return _USERS_CACHE
 
-def add_attendance(name: str):
+def append_user(uname: str, fullname: str, hashed: str, created: str):
+    """Append one user row to users.csv and update the in-memory cache."""
+    global _USERS_MTIME
+    users = safe_read_users()
+    with open(USERS_FILE, "a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow([uname, fullname, hashed, created])
+    users[uname] = {"FullName": fullname, "Password": hashed, "Created": created}
+    _USERS_MTIME = os.stat(USERS_FILE).st_mtime
+
+def check_user_password(uname: str, pwd: str) -> bool:
+    row = safe_read_users().get(uname)
+    return bool(row) and verify_password(pwd, row["Password"])
+
+ATTENDANCE_FIELDS = ["Name", "Date", "Time"]
+
+# Parsed local attendance: (record, lowercased name, date) per row, keyed by file mtime
+_ATTN_CACHE = {"mtime": None, "rows": []}
+
+@lru_cache(maxsize=4096)
+def parse_record_date(s):
+    """Parse a stored 'dd-mm-YYYY' attendance date; None when malformed."""
     try:
-        df = pd.read_csv(ATTENDANCE_FILE)
-    except Exception:
-        df = pd.DataFrame(columns=["Name","Date","Time"])
-    df.loc[len(df)] = [
-        name,
-        datetime.now().strftime("%d-%m-%Y"),
-        datetime.now().strftime("%I:%M %p")
-    ]
-    df.to_csv(ATTENDANCE_FILE, index=False)
-
-def load_attendance(filters=None):
-    all_records = []
-    
-    # 1. Load from Local CSV
+        return datetime.strptime(s, "%d-%m-%Y").date()
+    except (TypeError, ValueError):
+        return None
+
+@lru_cache(maxsize=512)
+def parse_filter_date(s):
+    """Parse a date typed into the report filters (HTML date input or dd-mm-YYYY)."""
+    s = (s or "").strip()
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def _attendance_row(rec):
+    return (rec, str(rec["Name"] or "").lower(), parse_record_date(rec["Date"]))
+
+def read_local_attendance():
+    """Cached parsed rows of attendance.csv, re-read only when the file changes."""
+    with _ATTENDANCE_LOCK:
+        try:
+            mtime = os.stat(ATTENDANCE_FILE).st_mtime
+        except OSError:
+            _ATTN_CACHE.update(mtime=None, rows=[])
+            return []
+        if mtime != _ATTN_CACHE["mtime"]:
+            with open(ATTENDANCE_FILE, newline="", encoding="utf-8") as f:
+                rows = [_attendance_row({k: row.get(k) for k in ATTENDANCE_FIELDS}) for row in csv.DictReader(f)]
+            _ATTN_CACHE.update(mtime=mtime, rows=rows)
+        return _ATTN_CACHE["rows"]
+
+def add_attendance(name: str):
+    now = datetime.now()
+    rec = {"Name": name, "Date": now.strftime("%d-%m-%Y"), "Time": now.strftime("%I:%M %p")}
+    with _ATTENDANCE_LOCK:
+        was_current = os.path.exists(ATTENDANCE_FILE) and os.stat(ATTENDANCE_FILE).st_mtime == _ATTN_CACHE["mtime"]
+        with open(ATTENDANCE_FILE, "a+b") as f:
+            # a last line without newline (hand edit, other tool) would swallow this row
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\r\n")
+        with open(ATTENDANCE_FILE, "a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow([rec[k] for k in ATTENDANCE_FIELDS])
+        if was_current:
+            # Keep the cache warm instead of re-reading the whole file
+            _ATTN_CACHE["rows"].append(_attendance_row(rec))
+            _ATTN_CACHE["mtime"] = os.stat(ATTENDANCE_FILE).st_mtime
+
+def attendance_records(filters=None):
+    """Filtered attendance (local CSV + recent Firestore) as dicts, newest first."""
+    filters = filters or {}
+    name = filters.get("name","").strip().lower()
+    d_from = parse_filter_date(filters.get("date_from",""))
+    d_to = parse_filter_date(filters.get("date_to",""))
+
+    def keep(name_lower, d):
+        if name and name not in name_lower:
+            return False
+        if d_from or d_to:
+            if d is None or (d_from and d < d_from) or (d_to and d > d_to):
+                return False
+        return True
+
+    records = []
+    seen = set()
+
+    # 1. Local CSV (parsed once per file change), filtered row by row
     try:
-        if os.path.exists(ATTENDANCE_FILE):
-            df_local = pd.read_csv(ATTENDANCE_FILE)
-            all_records = df_local.to_dict(orient="records")
+        for rec, name_lower, d in read_local_attendance():
+            if keep(name_lower, d):
+                records.append(rec)
+                seen.add((rec["Name"], rec["Date"], rec["Time"]))
     except Exception as e:
         logger.error(f"Local attendance read failed: {e}")
 
     # 2. Add from Firebase if available
     if USE_FIREBASE:
         try:
-            # We fetch recent 50 records from Firestore to avoid heavy load
-            docs = db.collection("attendance").order_by("timestamp", direction=firestore.Query.DESCENDING).limit(50).stream()
+            # Push the date range down to the indexed timestamp field and fetch one page.
+            # Bounds are local midnights made tz-aware: Firestore reads naive
+            # datetimes as UTC, but the Date strings and keep() use local days
+            query = db.collection("attendance")
+            if d_from:
+                query = query.where("timestamp", ">=", datetime.combine(d_from, datetime.min.time()).astimezone())
+            if d_to:
+                query = query.where("timestamp", "<", datetime.combine(d_to + timedelta(days=1), datetime.min.time()).astimezone())
+            docs = query.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(PAGE_SIZE).stream()
             for doc in docs:
                 data = doc.to_dict()
                 # Mapping Firebase fields to expected keys
@@ -153,42 +315,46 @@ def load_attendance(filters=None):
                     "Date": data.get("date"),
                     "Time": data.get("time")
                 }
-                # Avoid simple duplicates if local already has it (naive check)
-                if not any(r['Name'] == rec['Name'] and r['Date'] == rec['Date'] and r['Time'] == rec['Time'] for r in all_records):
-                    all_records.append(rec)
+                key = (rec["Name"], rec["Date"], rec["Time"])
+                # Skip records the local CSV already has
+                if key not in seen and keep(*_attendance_row(rec)[1:]):
+                    seen.add(key)
+                    records.append(rec)
         except Exception as e:
             logger.error(f"Firebase attendance read failed: {e}")
 
-    df = pd.DataFrame(all_records)
-    if df.empty:
-        return pd.DataFrame(columns=["Name","Date","Time"])
+    # Newest first; rows with unparseable dates go last
+    def sort_key(rec):
+        d = parse_record_date(rec["Date"])
+        return (d is not None, d or date.min, str(rec["Time"] or ""))
+    records.sort(key=sort_key, reverse=True)
+    return records
 
-    if "Date" in df.columns:
-        df["DateObj"] = pd.to_datetime(df["Date"], errors="coerce", dayfirst=True)
-    else:
-        df["DateObj"] = pd.NaT
-
-    if filters:
-        name = filters.get("name","").strip()
-        d_from = filters.get("date_from","").strip()
-        d_to = filters.get("date_to","").strip()
-        if name and "Name" in df.columns:
-            df = df[df["Name"].str.contains(name, case=False, na=False)]
-        if d_from:
-            try:
-                df = df[df["DateObj"] >= pd.to_datetime(d_from)]
-            except:
-                pass
-        if d_to:
-            try:
-                df = df[df["DateObj"] <= pd.to_datetime(d_to)]
-            except:
-                pass
+CLOUD_USER_TTL = 30  # seconds
+CLOUD_USER_CACHE_SIZE = 256
+# LRU of existing users only: the key is whatever was typed at login, so
+# misses are never stored and the size is capped
+_CLOUD_USER_CACHE = OrderedDict()
+_cloud_user_lock = threading.Lock()
 
-    if "DateObj" in df.columns and "Time" in df.columns:
-        df = df.sort_values(by=["DateObj","Time"], ascending=[False, False])
-        return df.drop(columns=["DateObj"])
-    return df
+def get_cloud_user(uname: str):
+    """Firestore users/<uname> as a dict (None if missing), cached briefly for the login path."""
+    now = time.monotonic()
+    with _cloud_user_lock:
+        hit = _CLOUD_USER_CACHE.get(uname)
+        if hit and hit[0] > now:
+            _CLOUD_USER_CACHE.move_to_end(uname)
+            return hit[1]
+    doc = db.collection("users").document(uname).get()
+    if not doc.exists:
+        return None
+    data = doc.to_dict()
+    with _cloud_user_lock:
+        _CLOUD_USER_CACHE[uname] = (now + CLOUD_USER_TTL, data)
+        _CLOUD_USER_CACHE.move_to_end(uname)
+        while len(_CLOUD_USER_CACHE) > CLOUD_USER_CACHE_SIZE:
+            _CLOUD_USER_CACHE.popitem(last=False)
+    return data
 
 # -------------------
 # Decorators
@@ -212,52 +378,292 @@ def admin_required(fn):
         return fn(*a, **k)
     return wrapper
 
+DEBUG_SKIP_DIRS = {".git", "__pycache__", "venv", ".venv", "node_modules"}
+DEBUG_MAX_FILES = 5000
+
+def iter_files(top="."):
+    """Iterative os.scandir walk that yields file paths and skips bulky dirs."""
+    stack = [top]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in DEBUG_SKIP_DIRS:
+                            stack.append(entry.path)
+                    else:
+                        yield entry.path
+        except OSError:
+            continue
+
 @app.route("/debug-files")
 def debug_files():
-    files = []
-    for root, dirs, filenames in os.walk("."):
-        for f in filenames:
-            files.append(os.path.join(root, f))
-    return jsonify({"current_dir": os.getcwd(), "files": files})
+    if not app.debug:
+        abort(404)
+    files = list(islice(iter_files("."), DEBUG_MAX_FILES + 1))
+    truncated = len(files) > DEBUG_MAX_FILES
+    return jsonify({"current_dir": os.getcwd(), "files": files[:DEBUG_MAX_FILES], "truncated": truncated})
 
 # -------------------
 # Camera helpers
 # -------------------
+# libjpeg-turbo via simplejpeg is noticeably faster than cv2.imencode; optional.
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+FRAME_WIDTH, FRAME_HEIGHT = 640, 360
+CAMERA_FPS = 15
+JPEG_QUALITY = 80
+MJPG_FOURCC = cv2.VideoWriter_fourcc(*"MJPG")
+_PART_PREFIX = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+_PART_SUFFIX = b'\r\n'
+
+camera_mjpeg = False
+CLIENT_IDLE_TIMEOUT = 10  # seconds without a viewer before the camera is released
+
+# One capture thread reads + encodes; every /video_feed client waits on the condition
+_camera_lock = threading.Lock()
+_frame_cond = threading.Condition()
+_latest_part = None    # latest frame as a ready-to-send multipart chunk
+_frame_seq = 0
+_last_client = 0.0
+_capture_thread = None
+
 def get_camera():
-    global camera
-    if camera is None:
-        camera = cv2.VideoCapture(0)
-        camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    return camera
+    global camera, camera_mjpeg, _capture_thread, _last_client
+    with _camera_lock:
+        if camera is None:
+            camera = cv2.VideoCapture(0)
+            camera.set(cv2.CAP_PROP_FOURCC, MJPG_FOURCC)
+            camera.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+            camera.set(cv2.CAP_PROP_FPS, CAMERA_FPS)
+            # If the device really streams MJPEG at the size we serve, ask OpenCV
+            # for the compressed buffer and forward it without decode/re-encode.
+            camera_mjpeg = (
+                int(camera.get(cv2.CAP_PROP_FOURCC)) == MJPG_FOURCC
+                and int(camera.get(cv2.CAP_PROP_FRAME_WIDTH)) == FRAME_WIDTH
+                and int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT)) == FRAME_HEIGHT
+                and camera.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+            )
+        if _capture_thread is None or not _capture_thread.is_alive():
+            _last_client = time.monotonic()
+            _capture_thread = threading.Thread(target=_capture_loop, args=(camera,), daemon=True)
+            _capture_thread.start()
+        return camera
 
 def release_camera():
-    global camera
+    global camera, camera_mjpeg
+    with _camera_lock:
+        cam, camera = camera, None
+        camera_mjpeg = False
+        thread = _capture_thread
+    # Let the capture thread finish its current read before closing the device
+    if thread is not None and thread is not threading.current_thread():
+        thread.join(timeout=2)
     try:
-        if camera:
-            camera.release()
+        if cam:
+            cam.release()
     except Exception:
         pass
-    camera = None
 
-def gen_frames():
-    cam = get_camera()
-    while True:
+_resize_buffer = None
+
+def fit_frame(frame):
+    """Bring a frame to FRAME_WIDTH x FRAME_HEIGHT as cheaply as possible."""
+    global _resize_buffer
+    h, w = frame.shape[:2]
+    if w == FRAME_WIDTH and h == FRAME_HEIGHT:
+        return frame
+    if w == FRAME_WIDTH and h > FRAME_HEIGHT:
+        # Driver gave e.g. 640x480: centre crop is a numpy view, no copy
+        top = (h - FRAME_HEIGHT) // 2
+        return frame[top:top + FRAME_HEIGHT]
+    if _resize_buffer is None or _resize_buffer.shape[2:] != frame.shape[2:]:
+        _resize_buffer = np.empty((FRAME_HEIGHT, FRAME_WIDTH) + frame.shape[2:], dtype=frame.dtype)
+    cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT), dst=_resize_buffer, interpolation=cv2.INTER_AREA)
+    return _resize_buffer
+
+def encode_jpeg(frame):
+    """Encode a BGR frame to JPEG bytes, or None on failure."""
+    if simplejpeg is not None:
+        return simplejpeg.encode_jpeg(frame, quality=JPEG_QUALITY, colorspace="BGR", fastdct=True)
+    ok, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+    return buffer.tobytes() if ok else None
+
+# Optional H.264/HLS output: ffmpeg encodes the frames the capture thread already
+# has, ~10x less bandwidth than MJPEG. /video_feed stays as the fallback.
+HLS_DIR = os.environ.get("HLS_DIR", os.path.join(tempfile.gettempdir(), "ai-attendance-hls"))
+HLS_ENCODER = os.environ.get("HLS_ENCODER", "libx264")  # h264_nvenc / h264_omx / h264_v4l2m2m on hw hosts
+FFMPEG = shutil.which("ffmpeg")
+HLS_QUEUE = 2  # frames buffered for ffmpeg; more are dropped, not waited on
+_hls_lock = threading.Lock()
+_hls_proc = None
+_hls_frames = None  # frames waiting for the HLS writer thread
+_hls_writer = None
+
+def start_hls():
+    """Spawn the ffmpeg HLS encoder if needed; False when ffmpeg is not installed."""
+    global _hls_proc, _hls_frames, _hls_writer
+    if not FFMPEG:
+        return False
+    with _hls_lock:
+        if _hls_proc is not None and _hls_proc.poll() is None:
+            return True
+        os.makedirs(HLS_DIR, exist_ok=True)
+        # The capture loop runs at whatever rate the camera delivers, often below
+        # CAMERA_FPS: stamp frames on arrival and let ffmpeg dup/drop to a
+        # constant rate, so segment durations match real time
+        args = [FFMPEG, "-loglevel", "error", "-use_wallclock_as_timestamps", "1",
+                "-f", "rawvideo", "-pix_fmt", "bgr24",
+                "-s", f"{FRAME_WIDTH}x{FRAME_HEIGHT}", "-i", "-",
+                "-c:v", HLS_ENCODER]
+        if HLS_ENCODER == "libx264":
+            args += ["-preset", "ultrafast", "-tune", "zerolatency"]
+        args += ["-vsync", "cfr", "-r", str(CAMERA_FPS),
+                 "-pix_fmt", "yuv420p", "-g", str(CAMERA_FPS * 2),
+                 "-f", "hls", "-hls_time", "1", "-hls_list_size", "3",
+                 "-hls_flags", "delete_segments", os.path.join(HLS_DIR, "index.m3u8")]
+        try:
+            proc = subprocess.Popen(args, stdin=subprocess.PIPE)
+        except OSError:
+            logger.exception("Failed to start ffmpeg for HLS")
+            _hls_proc = None
+            return False
+        _hls_proc = proc
+        _hls_frames = queue.Queue(maxsize=HLS_QUEUE)
+        _hls_writer = threading.Thread(target=_write_hls, args=(proc, _hls_frames), daemon=True)
+        _hls_writer.start()
+    return True
+
+def stop_hls():
+    global _hls_proc, _hls_writer
+    with _hls_lock:
+        proc, _hls_proc = _hls_proc, None
+        writer, _hls_writer = _hls_writer, None
+    if proc is None:
+        return
+    # The writer closes ffmpeg's stdin once it sees _hls_proc change; if it is
+    # stuck in a write to a stalled encoder, killing ffmpeg unblocks it
+    if writer is not None and writer is not threading.current_thread():
+        writer.join(timeout=2)
+        if writer.is_alive():
+            proc.kill()
+    try:
+        proc.wait(timeout=2)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+def _feed_hls(frame):
+    # Never block the capture thread (and with it every MJPEG viewer) on the
+    # encoder: when it falls behind, this frame is dropped for HLS only
+    frames = _hls_frames
+    if _hls_proc is None or frames is None or frames.full():
+        return
+    try:
+        # copy: fit_frame hands back its reused resize buffer or a view
+        frames.put_nowait(np.ascontiguousarray(frame).tobytes())
+    except queue.Full:
+        pass
+
+def _write_hls(proc, frames):
+    """HLS writer thread: pipe queued frames into ffmpeg until stopped."""
+    global _hls_proc, _hls_writer
+    try:
+        while _hls_proc is proc:
+            try:
+                data = frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            proc.stdin.write(data)
+    except (OSError, ValueError):
+        with _hls_lock:
+            if _hls_proc is not proc:
+                return  # stop_hls killed it
+            _hls_proc = _hls_writer = None
+        logger.warning("HLS encoder exited, stopping HLS output")
+        proc.kill()
+    finally:
+        try:
+            proc.stdin.close()
+        except (OSError, ValueError):
+            pass
+
+def _close_camera(cam):
+    """Called from the capture thread: drop cam if it is still the shared camera."""
+    global camera, camera_mjpeg
+    with _camera_lock:
+        if camera is cam:
+            camera = None
+            camera_mjpeg = False
+    try:
+        cam.release()
+    except Exception:
+        pass
+
+def _capture_loop(cam):
+    global _latest_part, _frame_seq
+    while camera is cam:
+        if time.monotonic() - _last_client > CLIENT_IDLE_TIMEOUT:
+            logger.info("No stream viewers, releasing camera")
+            _close_camera(cam)
+            break
         ok, frame = cam.read()
         if not ok:
             logger.debug("Camera read failed")
+            _close_camera(cam)
             break
-        frame = cv2.resize(frame, (640,360))
-        _, buffer = cv2.imencode('.jpg', frame)
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+        if camera_mjpeg and frame.ndim < 3:
+            # Raw MJPEG buffer straight from the device (1 x N bytes)
+            jpeg = frame.tobytes()
+            if _hls_proc is not None:
+                decoded = cv2.imdecode(frame, cv2.IMREAD_COLOR)
+                if decoded is not None:  # corrupt/truncated buffer: skip HLS for it
+                    _feed_hls(fit_frame(decoded))
+        else:
+            frame = fit_frame(frame)
+            jpeg = encode_jpeg(frame)
+            if _hls_proc is not None:
+                _feed_hls(frame)
+        if jpeg is None:
+            continue
+        # Build the multipart chunk once here so viewers just yield the same bytes
+        part = b"".join((_PART_PREFIX, jpeg, _PART_SUFFIX))
+        with _frame_cond:
+            _latest_part = part
+            _frame_seq += 1
+            _frame_cond.notify_all()
+    stop_hls()
+    # Wake any viewers so they notice the producer is gone
+    with _frame_cond:
+        _frame_cond.notify_all()
+
+def gen_frames():
+    global _last_client
+    get_camera()
+    thread = _capture_thread
+    seen = _frame_seq
+    while True:
+        with _frame_cond:
+            _last_client = time.monotonic()
+            _frame_cond.wait_for(lambda: _frame_seq != seen or not thread.is_alive(), timeout=1.0)
+            if _frame_seq == seen:
+                if not thread.is_alive():
+                    break
+                continue
+            seen, part = _frame_seq, _latest_part
+        yield part
 
 # -------------------
 # Routes: Login / API
 # -------------------
-@app.before_request
-def refresh_session():
+def start_session(u: str, role: str):
     session.permanent = True
+    session["logged_in"] = True
+    session["username"] = u
+    session["role"] = role
 
 @app.route("/login", methods=["GET","POST"])
 def login():
@@ -267,35 +673,24 @@ def login():
             p = request.form.get("password","").strip()
             
             # 1. Admin Check
-            if u == ADMIN_USER and p == ADMIN_PASS:
-                session["logged_in"] = True
-                session["username"] = u
-                session["role"] = "admin"
+            if is_admin(u, p):
+                start_session(u, "admin")
                 flash("Logged in as admin","success")
                 return redirect(url_for("main_dashboard"))
             
             # 2. Local CSV Check
-            users = safe_read_users()
-            if not users.empty and u in users["Username"].values:
-                row = users[users["Username"] == u].iloc[0]
-                stored = str(row.get("Password",""))
-                if stored and hash_password(p) == stored:
-                    session["logged_in"] = True
-                    session["username"] = u
-                    session["role"] = "employee"
-                    flash("Logged in as employee","success")
-                    return redirect(url_for("employee_dashboard"))
+            if check_user_password(u, p):
+                start_session(u, "employee")
+                flash("Logged in as employee","success")
+                return redirect(url_for("employee_dashboard"))
             
             # 3. Cloud (Firestore) Check - For Cloud Persistance
             if USE_FIREBASE:
                 try:
-                    user_doc = db.collection("users").document(u).get()
-                    if user_doc.exists:
-                        data = user_doc.to_dict()
-                        if data.get("password") == hash_password(p):
-                            session["logged_in"] = True
-                            session["username"] = u
-                            session["role"] = data.get("role", "employee")
+                    data = get_cloud_user(u)
+                    if data:
+                        if verify_password(p, data.get("password") or ""):
+                            start_session(u, data.get("role", "employee"))
                             flash(f"Logged in as {session['role']} (Cloud)","success")
                             return redirect(url_for("main_dashboard" if session["role"]=="admin" else "employee_dashboard"))
                 except Exception as e:
@@ -316,14 +711,10 @@ def api_login():
         password = request.form.get("password") or (request.json or {}).get("password")
         username = (username or "").strip()
         password = (password or "").strip()
-        if username == ADMIN_USER and password == ADMIN_PASS:
+        if is_admin(username, password):
             return jsonify({"success": True, "role": "admin"})
-        users = safe_read_users()
-        if not users.empty and username in users["Username"].values:
-            row = users[users["Username"] == username].iloc[0]
-            stored_hash = str(row.get("Password",""))
-            if stored_hash and hash_password(password) == stored_hash:
-                return jsonify({"success": True, "role": "employee"})
+        if check_user_password(username, password):
+            return jsonify({"success": True, "role": "employee"})
         return jsonify({"success": False, "message": "Invalid username or password"})
     except Exception as e:
         logger.exception("API login error")
@@ -345,16 +736,16 @@ def logout():
 @app.route("/")
 @admin_required
 def main_dashboard():
-    df = load_attendance()
-    present = "Present" if len(df) > 0 else "Absent"
-    records = df.to_dict(orient="records")
+    records = attendance_records()
+    present = "Present" if len(records) > 0 else "Absent"
     return render_template("main_dashboard.html",
                            today=datetime.now().strftime("%d %B %Y"),
                            status=present,
-                           count=len(df),
+                           count=len(records),
                            user=session.get("username"),
                            today_date=datetime.now().strftime("%d-%m-%Y"),
                            current_time=datetime.now().strftime("%I:%M %p"),
+                           hls_enabled=bool(FFMPEG),
                            attendance_logs=records[:10]) # Show last 10 logs
 
 @app.route("/employee-dashboard")
@@ -377,7 +768,7 @@ def employee_dashboard():
 @app.route("/assign-task", methods=["GET","POST"])
 @admin_required
 def assign_task():
-    users = safe_read_users()["Username"].tolist()
+    users = list(safe_read_users())
     if request.method == "POST":
         user = request.form.get("user")
         task = request.form.get("task")
@@ -403,9 +794,8 @@ def assign_task():
                 flash("Task assigned but Firestore save failed","warning")
         else:
             try:
-                df = pd.read_csv(TASKS_LOCAL)
-                df.loc[len(df)] = [user, task, status, task_data["date"], task_data["time"], datetime.now().isoformat()]
-                df.to_csv(TASKS_LOCAL, index=False)
+                with _TASKS_LOCK, open(TASKS_LOCAL, "a", newline="", encoding="utf-8") as f:
+                    csv.writer(f).writerow([user, task, status, task_data["date"], task_data["time"], datetime.now().isoformat()])
                 flash("Task assigned (local)","success")
             except Exception:
                 logger.exception("Failed writing local task file")
@@ -413,6 +803,25 @@ def assign_task():
         return redirect(url_for("assign_task"))
     return render_template("assign_task.html", users=users)
 
+def update_local_task_status(user, new_status):
+    """Set the status of the user's latest local task; rewrites via a temp file + os.replace."""
+    with _TASKS_LOCK:
+        with open(TASKS_LOCAL, newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        if not rows:
+            return False
+        header = rows[0]
+        ucol, scol = header.index("user"), header.index("status")
+        last = next((i for i in range(len(rows) - 1, 0, -1) if len(rows[i]) > ucol and rows[i][ucol] == user), None)
+        if last is None:
+            return False
+        rows[last][scol] = new_status
+        tmp = TASKS_LOCAL + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+        os.replace(tmp, TASKS_LOCAL)
+    return True
+
 @app.route("/update-task", methods=["POST"])
 def update_task():
     if session.get("role") != "employee":
@@ -431,13 +840,7 @@ def update_task():
     if not USE_FIREBASE or not updated:
         try:
             if os.path.exists(TASKS_LOCAL):
-                df = pd.read_csv(TASKS_LOCAL)
-                idx = df[df["user"] == user].index
-                if len(idx) > 0:
-                    i = idx[-1]
-                    df.at[i, "status"] = new_status
-                    df.to_csv(TASKS_LOCAL, index=False)
-                    updated = True
+                updated = update_local_task_status(user, new_status)
         except Exception:
             logger.exception("Failed updating local tasks file")
     flash("Task updated" if updated else "No task found to update", "success" if updated else "error")
@@ -449,28 +852,39 @@ def task_history():
     role = session.get("role")
     user = session.get("username")
     tasks_out = []
+    next_after = None
     if USE_FIREBASE:
         try:
-            if role == "admin":
-                docs = db.collection("tasks").order_by("created", direction=None).stream()
-            else:
-                docs = db.collection("tasks").where("user","==",user).order_by("created", direction=None).stream()
-            for d in docs:
+            query = db.collection("tasks")
+            if role != "admin":
+                query = query.where("user","==",user)
+            query = query.order_by("created", direction=None)
+            after = request.args.get("after")
+            if after:
+                cursor = db.collection("tasks").document(after).get()
+                if cursor.exists:
+                    query = query.start_after(cursor)
+            last_id = None
+            for d in query.limit(PAGE_SIZE).stream():
                 data = d.to_dict()
+                last_id = d.id
                 tasks_out.append({"User": data.get("user",""), "Task": data.get("task",""), "Status": data.get("status",""), "Date": data.get("date",""), "Time": data.get("time","")})
+            if len(tasks_out) == PAGE_SIZE:
+                next_after = last_id
         except Exception:
             logger.exception("Failed reading tasks from Firestore")
             flash("Could not fetch tasks from Firestore","warning")
     else:
         try:
             if os.path.exists(TASKS_LOCAL):
-                df = pd.read_csv(TASKS_LOCAL).sort_values(by="created", ascending=False)
-                for _, r in df.iterrows():
+                with open(TASKS_LOCAL, newline="", encoding="utf-8") as f:
+                    rows = sorted(csv.DictReader(f), key=lambda r: r.get("created") or "", reverse=True)
+                for r in rows:
                     if role == "admin" or r.get("user") == user:
                         tasks_out.append({"User": r.get("user",""), "Task": r.get("task",""), "Status": r.get("status",""), "Date": r.get("date",""), "Time": r.get("time","")})
         except Exception:
             logger.exception("Failed reading local tasks")
-    return render_template("task_history.html", tasks=tasks_out)
+    return render_template("task_history.html", tasks=tasks_out, next_after=next_after)
 
 # -------------------
 # Attendance mark + export
@@ -488,10 +902,15 @@ def mark_attendance():
 @app.route("/export/excel")
 @admin_required
 def export_excel():
-    df = load_attendance()
+    filters = {"name": request.args.get("name",""), "date_from": request.args.get("date_from",""), "date_to": request.args.get("date_to","")}
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False)
+    # constant_memory flushes each row as it is written instead of holding the sheet in RAM
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    sheet = workbook.add_worksheet()
+    sheet.write_row(0, 0, ATTENDANCE_FIELDS)
+    for i, rec in enumerate(attendance_records(filters), 1):
+        sheet.write_row(i, 0, [rec[k] for k in ATTENDANCE_FIELDS])
+    workbook.close()
     output.seek(0)
     return send_file(output, as_attachment=True,
                      download_name=f"attendance_{datetime.now().strftime('%Y%m%d')}.xlsx",
@@ -514,17 +933,15 @@ def add_user():
             return redirect(url_for("add_user"))
         
         # Check Local
-        df = safe_read_users()
-        if uname in df["Username"].values:
+        if uname in safe_read_users():
             flash("User already exists (Local)","error")
             return redirect(url_for("add_user"))
         
         hashed = hash_password(pwd)
         
         # 1. Save Local CSV
-        df.loc[len(df)] = [uname, fname, hashed, datetime.now().strftime("%d-%m-%Y")]
         try:
-            df.to_csv(USERS_FILE, index=False)
+            append_user(uname, fname, hashed, datetime.now().strftime("%d-%m-%Y"))
             
             # 2. Save to Firebase (Cloud Persistence)
             if USE_FIREBASE:
@@ -536,6 +953,8 @@ def add_user():
                         "role": role,
                         "created": datetime.now()
                     })
+                    with _cloud_user_lock:
+                        _CLOUD_USER_CACHE.pop(uname, None)
                     # Keep existing 'employees' collection compatibility if needed
                     db.collection("employees").document(uname).set({"fullname": fname, "created": datetime.now()})
                     flash("User synced to Cloud and Local","success")
@@ -579,9 +998,113 @@ def stop_camera():
 def video_feed():
     return Response(gen_frames(), mimetype="multipart/x-mixed-replace; boundary=frame")
 
+@app.route("/hls/<path:name>")
+@login_required
+def hls_stream(name):
+    global _last_client
+    if not start_hls():
+        abort(404)
+    get_camera()
+    _last_client = time.monotonic()
+    # Playlist changes every segment; segments themselves are immutable
+    return send_from_directory(HLS_DIR, name, max_age=0 if name.endswith(".m3u8") else 60)
+
 # -------------------
 # Notifications & report
 # -------------------
+# Unseen task ids kept current by Firestore listeners, so polling never hits Firestore
+_notify_lock = threading.Lock()
+_employee_unseen = {}   # username -> set of task ids with employee_seen == False
+_admin_unseen = set()   # task ids with admin_seen == False
+_task_watches = []
+
+_task_watch_failed = False  # set when a listener callback raised
+
+def _on_employee_unseen(snapshot, changes, read_time):
+    global _task_watch_failed
+    try:
+        with _notify_lock:
+            for change in changes:
+                doc = change.document
+                user = (doc.to_dict() or {}).get("user", "")
+                if change.type.name == "REMOVED":
+                    _employee_unseen.get(user, set()).discard(doc.id)
+                else:
+                    _employee_unseen.setdefault(user, set()).add(doc.id)
+    except Exception:
+        logger.exception("Employee task listener callback failed")
+        _task_watch_failed = True
+
+def _on_admin_unseen(snapshot, changes, read_time):
+    global _task_watch_failed
+    try:
+        with _notify_lock:
+            for change in changes:
+                if change.type.name == "REMOVED":
+                    _admin_unseen.discard(change.document.id)
+                else:
+                    _admin_unseen.add(change.document.id)
+    except Exception:
+        logger.exception("Admin task listener callback failed")
+        _task_watch_failed = True
+
+def stop_task_watch():
+    """Unsubscribe the listeners and forget what they cached."""
+    global _task_watch_failed
+    for w in _task_watches:
+        try:
+            w.unsubscribe()
+        except Exception:
+            pass
+    _task_watches.clear()
+    with _notify_lock:
+        _employee_unseen.clear()
+        _admin_unseen.clear()
+    _task_watch_failed = False
+
+def start_task_watch():
+    """Subscribe to unseen tasks; on failure /check-notifications falls back to queries."""
+    stop_task_watch()
+    try:
+        tasks = db.collection("tasks")
+        _task_watches.append(tasks.where("employee_seen","==",False).on_snapshot(_on_employee_unseen))
+        _task_watches.append(tasks.where("admin_seen","==",False).on_snapshot(_on_admin_unseen))
+    except Exception:
+        logger.exception("Firestore task listener failed; polling instead")
+        stop_task_watch()
+
+def task_watch_ok():
+    """True while the listener caches can be trusted. A listener whose stream
+    died (the watch closes itself) or whose callback raised drops them all,
+    so /check-notifications goes back to querying."""
+    if not _task_watches:
+        return False
+    if _task_watch_failed or any(getattr(w, "_closed", False) for w in _task_watches):
+        logger.warning("Firestore task listener stopped; polling instead")
+        stop_task_watch()
+        return False
+    return True
+
+if USE_FIREBASE:
+    start_task_watch()
+
+def post_fork_init():
+    """Per-worker setup after fork: fresh Firestore channel and listeners."""
+    init_firebase(reinit=True)
+    if USE_FIREBASE:
+        start_task_watch()
+
+FIRESTORE_BATCH_LIMIT = 500
+
+def mark_tasks_seen(task_ids):
+    """Set employee_seen on tasks with one batched write per 500 docs."""
+    tasks = db.collection("tasks")
+    for i in range(0, len(task_ids), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for task_id in task_ids[i:i + FIRESTORE_BATCH_LIMIT]:
+            batch.update(tasks.document(task_id), {"employee_seen": True})
+        batch.commit()
+
 @app.route("/check-notifications")
 @login_required
 def check_notifications():
@@ -592,28 +1115,31 @@ def check_notifications():
         if USE_FIREBASE:
             try:
                 if role == "admin":
-                    unread = list(db.collection("tasks").where("admin_seen","==",False).limit(5).stream())
-                    if len(unread) > 0:
+                    if task_watch_ok():
+                        with _notify_lock:
+                            has_unread = bool(_admin_unseen)
+                    else:
+                        has_unread = bool(list(db.collection("tasks").where("admin_seen","==",False).limit(5).stream()))
+                    if has_unread:
                         result.update({"popup": True, "message": "Employee updated a task", "red_dot": True})
                 elif role == "employee":
-                    unread = list(db.collection("tasks").where("user","==",user).where("employee_seen","==",False).limit(5).stream())
+                    if task_watch_ok():
+                        with _notify_lock:
+                            unread = list(_employee_unseen.pop(user, ()))
+                    else:
+                        unread = [t.id for t in db.collection("tasks").where("user","==",user).where("employee_seen","==",False).limit(5).stream()]
                     if len(unread) > 0:
-                        for t in unread:
-                            try:
-                                db.collection("tasks").document(t.id).update({"employee_seen": True})
-                            except Exception:
-                                pass
+                        try:
+                            mark_tasks_seen(unread)
+                        except Exception:
+                            logger.debug("Failed marking tasks as seen")
+                            if task_watch_ok():
+                                # put them back so the next poll retries instead of losing them
+                                with _notify_lock:
+                                    _employee_unseen.setdefault(user, set()).update(unread)
                         result.update({"popup": True, "message": "New Task Assigned!", "red_dot": True})
             except Exception:
                 logger.debug("Error while checking tasks in Firestore")
-        else:
-            try:
-                if os.path.exists(TASKS_LOCAL):
-                    df = pd.read_csv(TASKS_LOCAL).sort_values(by="created", ascending=False)
-                    if not df[df["user"] == user].empty:
-                        result.update({"popup": False, "message": "", "red_dot": False})
-            except Exception:
-                pass
         return jsonify(result)
     except Exception:
         logger.exception("check-notifications failed")
@@ -623,8 +1149,8 @@ def check_notifications():
 @admin_required
 def report():
     filters = {"name": request.args.get("name",""), "date_from": request.args.get("date_from",""), "date_to": request.args.get("date_to","")}
-    df = load_attendance(filters)
-    return render_template("report.html", data=df.to_dict(orient="records"), total=len(df))
+    records = attendance_records(filters)
+    return render_template("report.html", data=records, total=len(records))
 
 # -------------------
 # Error handlers
@@ -645,6 +1171,6 @@ if __name__ == "__main__":
     # For local development
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=True)
 else:
-    # For production (gunicorn)
+    # For production: gunicorn -c gunicorn.conf.py app:app
     # The 'app' object is already defined globally as 'app'
     pass
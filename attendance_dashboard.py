@@ -5,13 +5,39 @@ import subprocess
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
                              QTableWidget, QTableWidgetItem, QPushButton, QLabel, 
                              QMessageBox, QHeaderView)
-from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal
 from PyQt5.QtGui import QFont, QIcon
 
+# Optional: react to file-system events instead of polling every 2s
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
 ATTENDANCE_FILE = "attendance.csv"
 SCANNER_SCRIPT = "attendance_system_pro.py"
+ATTENDANCE_COLS = ["Name", "Date", "Time"]
+
+if WATCHDOG_AVAILABLE:
+    # Runs on the watchdog thread: only emits, the slot runs on the GUI thread
+    class _CsvChangeHandler(FileSystemEventHandler):
+        def __init__(self, path, signal):
+            super().__init__()
+            self.path = os.path.abspath(path)
+            self.signal = signal
+
+        def on_any_event(self, event):
+            paths = (event.src_path, getattr(event, "dest_path", ""))
+            if not event.is_directory and self.path in map(os.path.abspath, filter(None, paths)):
+                self.signal.emit()
+
 
 class AttendanceDashboard(QWidget):
+    # Emitted from the watchdog thread, delivered queued to load_data
+    reload_signal = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Smart Attendance Dashboard")
@@ -42,13 +68,33 @@ class AttendanceDashboard(QWidget):
         
         self.setup_ui()
         
-        # Auto-refresh timer (every 2 seconds)
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.load_data)
-        self.timer.start(2000)
+        # What the table currently shows, so refreshes only add new rows
+        self._last_mtime = None
+        self._last_len = 0
+        
+        self.observer = None
+        self.timer = None
+        if WATCHDOG_AVAILABLE:
+            # Reload only when the OS reports a change to the CSV
+            self.reload_signal.connect(self.load_data, Qt.QueuedConnection)
+            self.observer = Observer()
+            self.observer.schedule(_CsvChangeHandler(ATTENDANCE_FILE, self.reload_signal),
+                                   os.path.dirname(os.path.abspath(ATTENDANCE_FILE)))
+            self.observer.start()
+        else:
+            # Auto-refresh timer (every 2 seconds)
+            self.timer = QTimer()
+            self.timer.timeout.connect(self.load_data)
+            self.timer.start(2000)
         
         self.load_data()
 
+    def closeEvent(self, event):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+        super().closeEvent(event)
+
     def setup_ui(self):
         main_layout = QVBoxLayout()
         main_layout.setContentsMargins(20, 20, 20, 20)
@@ -77,7 +123,7 @@ class AttendanceDashboard(QWidget):
         self.refresh_btn = QPushButton("🔄 Refresh Data")
         self.refresh_btn.setCursor(Qt.PointingHandCursor)
         self.refresh_btn.setStyleSheet(self.btn_style("#007bff"))
-        self.refresh_btn.clicked.connect(self.load_data)
+        self.refresh_btn.clicked.connect(lambda: self.load_data(force=True))
         controls_layout.addWidget(self.refresh_btn)
         
         self.start_btn = QPushButton("📷 Launch Scanner")
@@ -89,14 +135,16 @@ class AttendanceDashboard(QWidget):
         main_layout.addLayout(controls_layout)
         
         # Data Table
-        self.table = QTableWidget()
+        self.table = QTableWidget(0, len(ATTENDANCE_COLS))
+        self.table.setHorizontalHeaderLabels(ATTENDANCE_COLS)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.table.setSelectionBehavior(QTableWidget.SelectRows)
         main_layout.addWidget(self.table)
         
         # Footer
-        footer = QLabel("System Ready • Auto-refreshing every 2s")
+        footer = QLabel("System Ready • Live updates on file change" if WATCHDOG_AVAILABLE
+                        else "System Ready • Auto-refreshing every 2s")
         footer.setStyleSheet("color: #888; font-size: 12px;")
         footer.setAlignment(Qt.AlignCenter)
         main_layout.addWidget(footer)
@@ -122,28 +170,44 @@ class AttendanceDashboard(QWidget):
             }}
         """
 
-    def load_data(self):
+    def load_data(self, force=False):
         if not os.path.exists(ATTENDANCE_FILE):
              # Create empty if not exists
-             pd.DataFrame(columns=["Name", "Date", "Time"]).to_csv(ATTENDANCE_FILE, index=False)
+             pd.DataFrame(columns=ATTENDANCE_COLS).to_csv(ATTENDANCE_FILE, index=False)
         
         try:
-            df = pd.read_csv(ATTENDANCE_FILE)
-            
-            # Sort: Assuming entries are appended, reverse to show latest first
-            if not df.empty:
-                df = df.iloc[::-1]
-
-            self.table.setRowCount(len(df))
-            cols = list(df.columns)
-            self.table.setColumnCount(len(cols))
-            self.table.setHorizontalHeaderLabels(cols)
-            
-            for i, row in enumerate(df.values):
+            # Refresh with an unchanged file (timer tick, duplicate fs event):
+            # one stat, no parse, no UI work
+            st = os.stat(ATTENDANCE_FILE)
+            mtime = (st.st_mtime_ns, st.st_size)
+            if not force and mtime == self._last_mtime:
+                return
+            self._last_mtime = mtime
+
+            df = pd.read_csv(ATTENDANCE_FILE, usecols=ATTENDANCE_COLS,
+                             dtype={c: str for c in ATTENDANCE_COLS})
+
+            if force or len(df) < self._last_len:
+                # Rewritten/truncated file (or manual refresh): rebuild the table
+                self.table.setRowCount(0)
+                self._last_len = 0
+
+            # Rows are appended to the CSV; open room for all the new ones at
+            # the top in one model insert (not one shift per row), then fill
+            # them newest first so the table stays latest-first
+            new = df.iloc[self._last_len:]
+            k = len(new)
+            if self._last_len == 0:
+                self.table.setRowCount(k)
+            elif k:
+                self.table.model().insertRows(0, k)
+            for i, row in enumerate(new.itertuples(index=False, name=None)):
+                r = k - 1 - i
                 for j, val in enumerate(row):
                     item = QTableWidgetItem(str(val))
                     item.setTextAlignment(Qt.AlignCenter)
-                    self.table.setItem(i, j, item)
+                    self.table.setItem(r, j, item)
+            self._last_len = len(df)
             
             self.status_label.setText(f"Status: Updated at {pd.Timestamp.now().strftime('%H:%M:%S')}")
             
@@ -1,10 +1,12 @@
 import cv2
-from mtcnn import MTCNN
+from face_detector import FaceDetector, make_tracker
 from keras_facenet import FaceNet
 import numpy as np
 import pandas as pd
 from datetime import datetime
 import os
+import queue
+import threading
 import firebase_admin
 from firebase_admin import credentials, firestore
 
@@ -24,44 +26,149 @@ try:
 except Exception as e:
     print(f"⚠ Firebase Init Failed: {e}")
 
+# Firebase writes run on a worker thread so the camera loop never waits on the network
+firebase_queue = queue.Queue()
+
+
+def firebase_worker():
+    while True:
+        item = firebase_queue.get()
+        if item is None:
+            break
+        try:
+            db.collection("attendance").add(item)
+            print(f"☁ Firebase Cloud Sync Complete for {item['name']}!")
+        except Exception as e:
+            print(f"❌ Firebase Sync Error: {e}")
+
+
+firebase_thread = None
+if USE_FIREBASE:
+    firebase_thread = threading.Thread(target=firebase_worker, daemon=True)
+    firebase_thread.start()
+
 # Load single-person embedding
 known_embedding = np.load("model/face_embedding.npy")
+# Constant reference vector: cast + L2-normalise once instead of re-norming per face
+known_embedding = known_embedding.astype(np.float32)
+known_embedding /= np.linalg.norm(known_embedding)
 
-detector = MTCNN()
+detector = FaceDetector()
+# Detect on a half-size copy; boxes come back in full-resolution coordinates
+DETECT_SCALE = 0.5
 embedder = FaceNet()
 
 if not os.path.exists(attendance_file):
     pd.DataFrame(columns=["Name","Date","Time"]).to_csv(attendance_file, index=False)
 
+# Reuse a face's label while its box overlaps the last classified one
+TRACK_IOU = 0.5
+TRACK_MAX_FRAMES = 30
+# Full detection every Nth frame (or when a tracker loses its face); KCF in between
+DETECT_EVERY = 5
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+# (name, date) pairs already in the CSV; read once, then kept in memory
+df0 = pd.read_csv(attendance_file)
+marked = set(zip(df0["Name"], df0["Date"]))
+del df0
+
+last_box = None
+last_label = None
+last_emb_frame = -TRACK_MAX_FRAMES
+frame_idx = 0
+tracks = []  # (tracker, box, label) per face from the last detection
+tracking_ok = False
+
 cap = cv2.VideoCapture(0)
+# MJPG at the size we use: compressed USB transfer and a cheap JPEG decode
+# instead of raw YUYV at the sensor's max resolution. Buffer of 1 so a slow
+# loop reads the newest frame rather than a backlog.
+cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+cap.set(cv2.CAP_PROP_FPS, 30)
+cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
 print("▶ Starting Attendance — Press Q to exit")
 
 while True:
     ret, frame = cap.read()
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    faces = detector.detect_faces(rgb)
-
-    for face in faces:
-        x, y, w, h = face["box"]
-        crop = frame[y:y+h, x:x+w]
-
-        if crop.size == 0:
+    frame_idx += 1
+    done = ("Aman", datetime.now().strftime("%d-%m-%Y")) in marked
+
+    if frame_idx % DETECT_EVERY == 0 or not tracking_ok:
+        faces = detector.detect(frame, scale=DETECT_SCALE)
+        labels = [None] * len(faces)
+
+        # Pass 1 (skipped once marked today): reuse tracked labels, batch the rest
+        pending, crops = [], []
+        for i, box in enumerate(faces if not done else ()):
+            if last_box is not None and frame_idx - last_emb_frame < TRACK_MAX_FRAMES and iou(box, last_box) > TRACK_IOU:
+                labels[i] = last_label
+                continue
+            x, y, w, h = box
+            crop = frame[y:y+h, x:x+w]
+
+            if crop.size == 0:
+                continue
+
+            crops.append(cv2.resize(crop, (160,160)))
+            pending.append(i)
+
+        if crops:
+            # Crops stay BGR slices of the frame; FaceNet's RGB order is a reversed-channel view of the batch
+            embs = embedder.embeddings(np.stack(crops)[..., ::-1])
+            # Both sides unit length, so cosine similarity is a bare dot
+            embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+            sims = embs @ known_embedding
+            for i, similarity in zip(pending, sims):
+                labels[i] = "Aman" if similarity > 0.70 else "Unknown"
+            last_emb_frame = frame_idx
+
+        tracks = []
+        for box, name in zip(faces, labels):
+            tracker = make_tracker()
+            if tracker is not None:
+                tracker.init(frame, box)
+            tracks.append((tracker, box, name))
+        tracking_ok = True
+    else:
+        # Tracked frame: move the boxes, keep their labels, no embedding
+        faces, labels, live = [], [], []
+        for tracker, box, name in tracks:
+            if tracker is not None:
+                ok, box = tracker.update(frame)
+                if not ok:
+                    tracking_ok = False
+                    continue
+                box = tuple(int(v) for v in box)
+            live.append((tracker, box, name))
+            faces.append(box)
+            labels.append(name)
+        tracks = live
+
+    # Already marked today: nothing left to recognise, just draw boxes
+    if done:
+        for x, y, w, h in faces:
+            cv2.rectangle(frame,(x,y),(x+w,y+h),(0,255,0),2)
+        cv2.putText(frame,"Attendance marked",(10,30),cv2.FONT_HERSHEY_SIMPLEX,1,(0,255,0),2)
+
+    # Pass 2: draw and mark attendance
+    for (x, y, w, h), name in zip(faces, labels):
+        if name is None:
             continue
-        
-        crop_rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
-        crop_resized = cv2.resize(crop_rgb, (160,160))
-        crop_emb = embedder.embeddings([crop_resized])[0]
-
-        # Cosine similarity
-        similarity = np.dot(known_embedding, crop_emb) / (
-            np.linalg.norm(known_embedding) * np.linalg.norm(crop_emb)
-        )
-
-        if similarity > 0.70:
-            name = "Aman"
-        else:
-            name = "Unknown"
+        last_box, last_label = (x, y, w, h), name
 
         cv2.rectangle(frame,(x,y),(x+w,y+h),(0,255,0),2)
         cv2.putText(frame,name,(x,y-5),cv2.FONT_HERSHEY_SIMPLEX,1,(0,255,0),2)
@@ -71,24 +178,20 @@ while True:
             time = datetime.now().strftime("%I:%M:%S %p")
 
             # Local CSV Sync
-            df = pd.read_csv(attendance_file)
-            if not ((df["Name"]=="Aman") & (df["Date"]==date)).any():
-                df.loc[len(df)] = ["Aman", date, time]
-                df.to_csv(attendance_file, index=False)
+            if (name, date) not in marked:
+                marked.add((name, date))
+                with open(attendance_file, "a", newline="") as f:
+                    f.write(f"{name},{date},{time}\n")
                 print(f"✔ Local Attendance Marked for {name}!")
 
-                # Firebase Cloud Sync
+                # Firebase Cloud Sync (queued, see firebase_worker)
                 if USE_FIREBASE:
-                    try:
-                        db.collection("attendance").add({
-                            "name": name,
-                            "date": date,
-                            "time": time,
-                            "timestamp": firestore.SERVER_TIMESTAMP
-                        })
-                        print(f"☁ Firebase Cloud Sync Complete for {name}!")
-                    except Exception as e:
-                        print(f"❌ Firebase Sync Error: {e}")
+                    firebase_queue.put({
+                        "name": name,
+                        "date": date,
+                        "time": time,
+                        "timestamp": firestore.SERVER_TIMESTAMP
+                    })
     
     cv2.imshow("Attendance System", frame)
 
@@ -97,3 +200,8 @@ while True:
 
 cap.release()
 cv2.destroyAllWindows()
+
+# Flush pending cloud writes before exiting
+if firebase_thread is not None:
+    firebase_queue.put(None)
+    firebase_thread.join()
@@ -1,6 +1,6 @@
 import cv2
 import os
-from mtcnn import MTCNN
+from face_detector import FaceDetector
 
 name = input("Enter person name: ")
 
@@ -8,7 +8,17 @@ folder = f"data/{name}"
 os.makedirs(folder, exist_ok=True)
 
 cap = cv2.VideoCapture(0)
-detector = MTCNN()
+# MJPG at the size we use: compressed USB transfer and a cheap JPEG decode
+# instead of raw YUYV at the sensor's max resolution. Buffer of 1 so a slow
+# loop reads the newest frame rather than a backlog.
+cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+cap.set(cv2.CAP_PROP_FPS, 30)
+cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+detector = FaceDetector()
+# Detect on a half-size copy; boxes come back in full-resolution coordinates
+DETECT_SCALE = 0.5
 
 count = 0
 print("📸 Capturing images... Press Q to stop")
@@ -18,11 +28,9 @@ while True:
     if not ret:
         break
 
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    faces = detector.detect_faces(rgb)
+    faces = detector.detect(frame, scale=DETECT_SCALE)
 
-    for face in faces:
-        x, y, w, h = face["box"]
+    for x, y, w, h in faces:
         crop = frame[y:y+h, x:x+w]
 
         if crop.size > 0:
@@ -3,21 +3,17 @@
 # Run: python create_my_ai_attendance_zip.py
 # Produces: my_ai_attendance.zip with Flutter project skeleton.
 
-import os, pathlib, zipfile, shutil, textwrap
+import pathlib, zipfile, textwrap
 
-BASE_DIR = pathlib.Path.cwd() / "my_ai_attendance"
+BASE_NAME = "my_ai_attendance"
 ZIP_PATH = pathlib.Path.cwd() / "my_ai_attendance.zip"
 
-# Reset folder if exists
-if BASE_DIR.exists():
-    shutil.rmtree(BASE_DIR)
-BASE_DIR.mkdir(parents=True, exist_ok=True)
+# Files are collected in memory and written straight into the zip (no temp folder)
+files = {}
 
-# Helper function to write files
+# Helper function to add files
 def write(path, content):
-    p = BASE_DIR / path
-    p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(content, encoding="utf-8")
+    files[path] = content
 
 
 # ------------------------------
@@ -320,15 +316,16 @@ class _CameraPageState extends State<CameraPage> {
 write("README.md", "AI Attendance Flutter App (Auto-generated)\n")
 write("assets/README.txt", "Put your images here\n")
 
-# Create android & ios placeholder folders
-(BASE_DIR / "android").mkdir(exist_ok=True)
-(BASE_DIR / "ios").mkdir(exist_ok=True)
+# Create android & ios placeholder folders (a trailing "/" is a zip directory entry)
+write("android/", "")
+write("ios/", "")
 
 # ------------------------------
 # ZIP the whole project
 # ------------------------------
-with zipfile.ZipFile(ZIP_PATH, "w", zipfile.ZIP_DEFLATED) as z:
-    for file in sorted(BASE_DIR.rglob("*")):
-        z.write(file, file.relative_to(BASE_DIR.parent))
+# Level 1: these are a few KB of text, level 6 just burns CPU for no real saving
+with zipfile.ZipFile(ZIP_PATH, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as z:
+    for path in sorted(files):
+        z.writestr(f"{BASE_NAME}/{path}", files[path])
 
 print("DONE! ZIP created:", ZIP_PATH)
@@ -0,0 +1,68 @@
+import os
+import cv2
+
+# YuNet: single-pass ONNX face detector run by OpenCV's DNN module, much faster
+# than MTCNN's three cascaded nets. Get the model from
+# https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/face_detection_yunet_2023mar.onnx
+# and put it in model/. Without it we fall back to MTCNN.
+YUNET_MODEL = os.environ.get("YUNET_MODEL", "model/face_detection_yunet_2023mar.onnx")
+# FACE_DETECTOR_CUDA=1 runs YuNet on the GPU (needs OpenCV built with CUDA)
+USE_CUDA = os.environ.get("FACE_DETECTOR_CUDA") == "1"
+
+
+class FaceDetector:
+    """detect(frame_bgr) -> list of (x, y, w, h) boxes, clamped to the frame.
+
+    scale < 1 runs detection on a downscaled copy (cost ~ area) and maps the
+    boxes back to full-resolution coordinates for cropping.
+    """
+
+    def __init__(self, score_threshold=0.8):
+        self._yunet = None
+        self._mtcnn = None
+        self._size = None
+        if os.path.exists(YUNET_MODEL) and hasattr(cv2, "FaceDetectorYN_create"):
+            backend, target = cv2.dnn.DNN_BACKEND_DEFAULT, cv2.dnn.DNN_TARGET_CPU
+            if USE_CUDA:
+                backend, target = cv2.dnn.DNN_BACKEND_CUDA, cv2.dnn.DNN_TARGET_CUDA
+            self._yunet = cv2.FaceDetectorYN_create(
+                YUNET_MODEL, "", (320, 320), score_threshold, 0.3, 5000, backend, target
+            )
+        else:
+            from mtcnn import MTCNN
+            self._mtcnn = MTCNN()
+
+    def detect(self, frame, scale=1.0):
+        h, w = frame.shape[:2]
+        small = frame
+        if scale != 1.0:
+            small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        sh, sw = small.shape[:2]
+        if self._yunet is not None:
+            # YuNet takes BGR directly; input size must match the frame
+            if self._size != (sw, sh):
+                self._yunet.setInputSize((sw, sh))
+                self._size = (sw, sh)
+            _, faces = self._yunet.detect(small)
+            raw = [] if faces is None else faces[:, :4].tolist()
+        else:
+            rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+            raw = [f["box"] for f in self._mtcnn.detect_faces(rgb)]
+
+        boxes = []
+        for box in raw:
+            x, y, bw, bh = (int(round(v / scale)) for v in box)
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + bw, w), min(y + bh, h)
+            if x1 > x0 and y1 > y0:
+                boxes.append((x0, y0, x1 - x0, y1 - y0))
+        return boxes
+
+
+def make_tracker():
+    """KCF tracker for following a face between detections (needs
+    opencv-contrib). Returns None without it; callers then reuse the last box."""
+    create = getattr(cv2, "TrackerKCF_create", None)
+    if create is None:
+        create = getattr(getattr(cv2, "legacy", None), "TrackerKCF_create", None)
+    return create() if create is not None else None
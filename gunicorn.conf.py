@@ -0,0 +1,33 @@
+# gunicorn -c gunicorn.conf.py app:app
+# gunicorn -c gunicorn.conf.py web_dashboard:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Threads, not gevent, by default: cv2.VideoCapture.read() and JPEG encoding
+# are blocking C calls that would stall a gevent hub. Set
+# GUNICORN_WORKER_CLASS=gevent for deployments without the camera stream.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# The webcam can only be opened by one process, so one worker serves the
+# stream; raise WEB_CONCURRENCY when the camera is not used.
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
+worker_connections = 100
+
+# Long-lived MJPEG responses must not be killed as hung workers
+timeout = 0
+keepalive = 5
+
+# Each worker imports the app itself and opens its own Firestore channel
+preload_app = False
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        import grpc.experimental.gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+    import sys
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        # Only reached if preload_app is turned on: don't reuse the parent's gRPC channel
+        app_module.post_fork_init()
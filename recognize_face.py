@@ -6,21 +6,41 @@ logging.getLogger('tensorflow').setLevel(logging.ERROR)  # Disable TF warnings
 import cv2
 import numpy as np
 from keras_facenet import FaceNet
-from mtcnn.mtcnn import MTCNN
-from PIL import Image
+from face_detector import FaceDetector, make_tracker
 
-# Load trained embedding
-known_embedding = np.load("model/face_embedding.npy")
+# Known faces as a matrix K [N, 512] of unit rows: one per training image if
+# available, else the single averaged embedding from older models
+if os.path.exists("model/face_embeddings.npy"):
+    K = np.load("model/face_embeddings.npy").astype(np.float32)
+else:
+    K = np.load("model/face_embedding.npy").astype(np.float32).reshape(1, -1)
+K /= np.linalg.norm(K, axis=1, keepdims=True)
 
 # Load models silently
 embedder = FaceNet()
-detector = MTCNN()
+detector = FaceDetector()
+# Detect on a half-size copy; boxes come back in full-resolution coordinates
+DETECT_SCALE = 0.5
 
 # Similarity threshold
 THRESHOLD = 0.75  
 
+# Full detection every Nth frame (or when a tracker loses its face); KCF in between
+DETECT_EVERY = 5
+frame_idx = 0
+tracks = []  # (tracker, box, label, color) per face from the last detection
+tracking_ok = False
+
 # Start webcam
 cap = cv2.VideoCapture(0)
+# MJPG at the size we use: compressed USB transfer and a cheap JPEG decode
+# instead of raw YUYV at the sensor's max resolution. Buffer of 1 so a slow
+# loop reads the newest frame rather than a backlog.
+cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+cap.set(cv2.CAP_PROP_FPS, 30)
+cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 print("\n🎥 Recognition started (Press Q to exit)")
 
 while True:
@@ -29,30 +49,51 @@ while True:
         print("❌ Frame capture failed!")
         break
 
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    faces = detector.detect_faces(rgb)
-
-    for face in faces:
-        x, y, w, h = face['box']
-
-        face_img = rgb[y:y+h, x:x+w]
-        face_img = Image.fromarray(face_img).resize((160, 160))
-        face_arr = np.asarray(face_img)
-
-        embedding = embedder.embeddings([face_arr])[0]
-
-        # Cosine similarity
-        similarity = np.dot(known_embedding, embedding) / (
-            np.linalg.norm(known_embedding) * np.linalg.norm(embedding)
-        )
-
-        if similarity > THRESHOLD:
-            label = f"Access Granted ({similarity:.2f})"
-            color = (0, 255, 0)
-        else:
-            label = f"Unknown ({similarity:.2f})"
-            color = (0, 0, 255)
-
+    frame_idx += 1
+
+    if frame_idx % DETECT_EVERY == 0 or not tracking_ok:
+        faces = detector.detect(frame, scale=DETECT_SCALE)
+
+        # One FaceNet call for all faces in the frame
+        crops = []
+        for x, y, w, h in faces:
+            crops.append(cv2.resize(frame[y:y+h, x:x+w], (160, 160), interpolation=cv2.INTER_AREA))
+        tracks = []
+        if crops:
+            # BGR crops -> RGB as a reversed-channel view of the batch, no frame-wide cvtColor
+            embeddings = embedder.embeddings(np.stack(crops)[..., ::-1])
+
+            # Cosine similarity of every face against every known row in one matmul
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+            sims = embeddings @ K.T
+
+            for box, similarity in zip(faces, sims.max(axis=1)):
+                if similarity > THRESHOLD:
+                    label = f"Access Granted ({similarity:.2f})"
+                    color = (0, 255, 0)
+                else:
+                    label = f"Unknown ({similarity:.2f})"
+                    color = (0, 0, 255)
+
+                tracker = make_tracker()
+                if tracker is not None:
+                    tracker.init(frame, box)
+                tracks.append((tracker, box, label, color))
+        tracking_ok = True
+    else:
+        # Tracked frame: move the boxes, keep their labels, no embedding
+        live = []
+        for tracker, box, label, color in tracks:
+            if tracker is not None:
+                ok, box = tracker.update(frame)
+                if not ok:
+                    tracking_ok = False
+                    continue
+                box = tuple(int(v) for v in box)
+            live.append((tracker, box, label, color))
+        tracks = live
+
+    for _, (x, y, w, h), label, color in tracks:
         cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
         cv2.putText(frame, label, (x, y - 10),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
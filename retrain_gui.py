@@ -4,7 +4,6 @@ import subprocess
 import sys
 import os
 import threading
-import time
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -93,11 +92,12 @@ def animate_assistant():
     if char_index <= len(msg):
         assistant_label.config(text=msg[:char_index])
         char_index += 1
+        root.after(80, animate_assistant)
     else:
-        time.sleep(1)
+        # Pause on the full message via the event loop, not sleep(), so clicks still work
         assistant_index = (assistant_index + 1) % len(assistant_messages)
         char_index = 0
-    root.after(80, animate_assistant)
+        root.after(1000, animate_assistant)
 
 # ---------- Buttons ----------
 
@@ -1,15 +1,16 @@
 import os
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from keras_facenet import FaceNet
-from mtcnn.mtcnn import MTCNN
-from PIL import Image
+import cv2
+from face_detector import FaceDetector
 
 # Initialize models
 embedder = FaceNet()
-detector = MTCNN()
+detector = FaceDetector()
 
 faces_dir = "faces_new"
-embeddings = []
+crops = []  # 160x160 RGB face crops, embedded together after the scan
 valid_ext = (".jpg", ".jpeg", ".png")
 
 print("📂 Starting face extraction & embedding...")
@@ -19,58 +20,68 @@ if not os.path.exists(faces_dir):
     print("❌ faces_new folder not found!")
     exit()
 
-for root, _, files in os.walk(faces_dir):
-    for img_name in files:
+paths = [os.path.join(root, f)
+         for root, _, files in os.walk(faces_dir)
+         for f in files if f.lower().endswith(valid_ext)]
 
-        if not img_name.lower().endswith(valid_ext):
-            continue
-
-        img_path = os.path.join(root, img_name)
+# Decode images on a small pool (cv2.imread releases the GIL) so disk reads and
+# JPEG decoding overlap with detection of the previous image
+with ThreadPoolExecutor(max_workers=4) as pool:
+    for img_path, img_bgr in zip(paths, pool.map(cv2.imread, paths)):
+        img_name = os.path.basename(img_path)
         print(f"\n🔍 Processing: {img_name}")
 
         try:
-            img = Image.open(img_path).convert("RGB")
-            img_np = np.asarray(img)
+            if img_bgr is None:
+                print("❌ Could not read image...")
+                continue
 
-            # Detect face
-            faces = detector.detect_faces(img_np)
+            # Detect face (same detector as the recognition scripts, so crops match)
+            faces = detector.detect(img_bgr)
 
             if len(faces) == 0:
                 print("❌ No face detected...")
                 continue
 
             # Get bounding box of first face
-            x, y, w, h = faces[0]['box']
-            face = img_np[y:y+h, x:x+w]
+            x, y, w, h = faces[0]
+            face = cv2.cvtColor(img_bgr[y:y+h, x:x+w], cv2.COLOR_BGR2RGB)
 
             # Resize for FaceNet
-            face_img = Image.fromarray(face).resize((160, 160))
-            face_array = np.asarray(face_img)
-
-            # Generate embedding
-            emb = embedder.embeddings([face_array])[0]
-            embeddings.append(emb)
+            face_array = cv2.resize(face, (160, 160), interpolation=cv2.INTER_AREA)
+            crops.append(face_array)
 
-            print("✔ Face detected & embedded successfully")
+            print("✔ Face detected")
 
         except Exception as e:
             print(f"⚠️ Error: {e}")
 
-# Convert embeddings to numpy array
-embeddings = np.array(embeddings)
-
-if len(embeddings) == 0:
+if not crops:
     print("\n❌ ERROR: No valid faces embedded!")
     print("➡ Try capturing images again with good light & face centered")
     exit()
 
+# Embed every crop in one FaceNet call (predict batches internally)
+print(f"\n🧠 Embedding {len(crops)} faces...")
+embeddings = embedder.embeddings(np.stack(crops))
+
 # Compute average embedding for final model
 mean_embedding = np.mean(embeddings, axis=0)
 
-# Save model file
+# Save model file. float16 halves the files and their load; float16 keeps
+# ~3 significant digits, plenty for a 0.7 cosine threshold. The recognisers
+# upcast to float32 on load because CPU BLAS has no fast float16 matmul.
 os.makedirs("model", exist_ok=True)
-np.save("model/face_embedding.npy", mean_embedding)
+np.save("model/face_embedding.npy", mean_embedding.astype(np.float16))
+# Per-image embeddings, L2-normalised, for matrix matching in recognize_face.py
+np.save("model/face_embeddings.npy",
+        (embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)).astype(np.float16))
+
+# Older versions saved a projection fit on this person's own embeddings; it
+# inflated strangers' scores, so recognition no longer uses it
+if os.path.exists("model/pca.npy"):
+    os.remove("model/pca.npy")
 
 print("\n🎯 TRAINING COMPLETE!")
-print("✔ Saved: model/face_embedding.npy")
+print("✔ Saved: model/face_embedding.npy, model/face_embeddings.npy")
 print("👤 Mode: Single person recognition enabled")
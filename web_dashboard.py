@@ -1,18 +1,38 @@
 # web_dashboard.py
 from flask import (
     Flask, render_template, request, redirect,
-    url_for, session, send_file, flash, Response, jsonify
+    url_for, session, send_file, flash, Response, jsonify,
+    send_from_directory, abort
 )
 import pandas as pd
+import xlsxwriter
 from datetime import datetime
 import logging
 import io
 import os
+import csv
+import bisect
+import hashlib
+import heapq
+import hmac
+import json
+import shutil
+import queue
+import subprocess
+import tempfile
 import cv2
-from functools import wraps
+import numpy as np
+from functools import lru_cache, wraps
 import threading
 import time
 
+# Optional: pyarrow, for fast upload parsing
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pacsv = None
+
 app = Flask(__name__, static_folder="static", template_folder="templates")
 
 # -----------------------
@@ -20,84 +40,281 @@ app = Flask(__name__, static_folder="static", template_folder="templates")
 # -----------------------
 app.secret_key = "Aman_SuperStrongSecretKey_ChangeThis"
 ATTENDANCE_FILE = "attendance.csv"
+ATTENDANCE_COLS = ("Name", "Date", "Time")
+CSV_EXPORT_CHUNK = 10_000  # rows per streamed /export/csv chunk
+ATTENDANCE_AGG = "attendance_agg.json"  # persisted /api/attendance counters
+PAGE_SIZE = 100  # dashboard rows per page; exports are never paginated
+MAX_PAGE_SIZE = 1000
 ADMIN_USER = "admin"
 ADMIN_PASS = "1234"
+# Digest computed once; login compares fixed-length digests in constant time
+ADMIN_PASS_HASH = hashlib.sha256(ADMIN_PASS.encode()).digest()
 
 # Disable console logs
 log = logging.getLogger("werkzeug")
 log.setLevel(logging.ERROR)
 
-# Global camera instance + lock
-camera = None
-camera_lock = threading.Lock()
-camera_active = False
-
-
 # -----------------------
 # CAMERA HELPERS
 # -----------------------
-def get_camera():
-    global camera, camera_active
-    with camera_lock:
-        if camera is None:
-            camera = cv2.VideoCapture(0)
-            # set smaller resolution for streaming stability
-            camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 360)
-        camera_active = True
-    return camera
-
-
-def stop_camera_instance():
-    global camera, camera_active
-    with camera_lock:
-        if camera is not None:
+# 75 is plenty for a 640x360 monitoring feed (default 95 costs CPU and bandwidth);
+# no Huffman optimisation pass. Built once, not per frame.
+JPEG_QUALITY = int(os.environ.get("JPEG_QUALITY", 75))
+JPEG_PARAMS = (int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY, int(cv2.IMWRITE_JPEG_OPTIMIZE), 0)
+MJPG_FOURCC = cv2.VideoWriter_fourcc(*"MJPG")
+CAMERA_FPS = 30
+
+# Optional H.264/HLS output (needs ffmpeg on PATH): the capture thread pipes the
+# frames it already has into ffmpeg, ~10x less bandwidth than MJPEG.
+# /video_feed stays as the fallback.
+HLS_DIR = os.environ.get("HLS_DIR", os.path.join(tempfile.gettempdir(), "web-dashboard-hls"))
+HLS_ENCODER = os.environ.get("HLS_ENCODER", "libx264")  # h264_v4l2m2m / h264_omx / h264_nvenc on hw hosts
+FFMPEG = shutil.which("ffmpeg")
+HLS_QUEUE = 2  # frames buffered for ffmpeg; more are dropped, not waited on
+
+# multipart/x-mixed-replace framing around each JPEG, built once
+_PART_PREFIX = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+_PART_SUFFIX = b"\r\n"
+
+
+class CameraBroadcaster:
+    """One capture thread reads + JPEG-encodes each frame once; every viewer
+    serves that same latest frame, regardless of how many are connected.
+    The frame is kept as a ready multipart part, so viewers send it as-is."""
+
+    def __init__(self, index=0, width=640, height=360):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.frame_part = None
+        self.seq = 0  # bumped per new frame so viewers can tell new from seen
+        self.passthrough = False  # device JPEGs forwarded as-is, no decode/encode
+        self._cam = None
+        self._thread = None
+        self._hls = None  # ffmpeg process while HLS output is on
+        self._hls_frames = None  # frames waiting for the HLS writer thread
+        self._hls_writer = None
+        self._lock = threading.Lock()       # guards start/stop
+        self._cond = threading.Condition()  # guards frame_part/seq, wakes viewers
+
+    @property
+    def active(self):
+        return self._cam is not None
+
+    def start(self):
+        with self._lock:
+            if self._cam is None:
+                cam = cv2.VideoCapture(self.index)
+                cam.set(cv2.CAP_PROP_FOURCC, MJPG_FOURCC)
+                # set smaller resolution for streaming stability
+                cam.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+                cam.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+                cam.set(cv2.CAP_PROP_FPS, CAMERA_FPS)
+                # If the device really streams MJPEG at our size, ask OpenCV for the
+                # compressed buffer and forward it; otherwise decode + imencode
+                self.passthrough = bool(
+                    int(cam.get(cv2.CAP_PROP_FOURCC)) == MJPG_FOURCC
+                    and int(cam.get(cv2.CAP_PROP_FRAME_WIDTH)) == self.width
+                    and int(cam.get(cv2.CAP_PROP_FRAME_HEIGHT)) == self.height
+                    and cam.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+                )
+                self._cam = cam
+                self._thread = threading.Thread(target=self._run, args=(cam,), daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            cam, self._cam = self._cam, None
+            thread, self._thread = self._thread, None
+        # Let the capture thread finish its current read before closing the device
+        if thread is not None:
+            thread.join(timeout=2)
+        if cam is not None:
             try:
-                camera.release()
+                cam.release()
             except Exception:
                 pass
-            camera = None
-        camera_active = False
+        self.stop_hls()
+        with self._cond:
+            self.frame_part = None
+            self._cond.notify_all()
+
+    def _run(self, cam):
+        while self._cam is cam:
+            ok, frame = cam.read()
+            if not ok or frame is None:
+                time.sleep(0.05)
+                continue
+            if self.passthrough and frame.ndim < 3:
+                # Raw MJPEG buffer straight from the device (1 x N bytes)
+                self._publish(frame)
+                if self._hls is not None:
+                    decoded = cv2.imdecode(frame, cv2.IMREAD_COLOR)
+                    if decoded is not None:
+                        self._feed_hls(decoded)
+                continue
+            # CAP_PROP size is usually honoured; only resize when the driver ignored it
+            if frame.shape[1] != self.width or frame.shape[0] != self.height:
+                frame = cv2.resize(frame, (self.width, self.height))
+            if self._hls is not None:
+                self._feed_hls(frame)
+            ret, buffer = cv2.imencode(".jpg", frame, JPEG_PARAMS)
+            if not ret:
+                continue
+            self._publish(buffer)
+
+    def start_hls(self):
+        """Spawn the ffmpeg HLS encoder if needed; False when ffmpeg is not installed."""
+        if not FFMPEG:
+            return False
+        with self._lock:
+            if self._hls is not None and self._hls.poll() is None:
+                return True
+            os.makedirs(HLS_DIR, exist_ok=True)
+            # The capture loop runs at whatever rate the camera delivers, often
+            # below CAMERA_FPS: stamp frames on arrival and let ffmpeg dup/drop
+            # to a constant rate, so segment durations match real time
+            args = [FFMPEG, "-loglevel", "error", "-use_wallclock_as_timestamps", "1",
+                    "-f", "rawvideo", "-pix_fmt", "bgr24",
+                    "-s", f"{self.width}x{self.height}", "-i", "-",
+                    "-c:v", HLS_ENCODER]
+            if HLS_ENCODER == "libx264":
+                args += ["-preset", "ultrafast", "-tune", "zerolatency"]
+            args += ["-vsync", "cfr", "-r", str(CAMERA_FPS),
+                     "-pix_fmt", "yuv420p", "-g", str(CAMERA_FPS),
+                     "-f", "hls", "-hls_time", "1", "-hls_list_size", "3",
+                     "-hls_flags", "delete_segments", os.path.join(HLS_DIR, "index.m3u8")]
+            try:
+                proc = subprocess.Popen(args, stdin=subprocess.PIPE)
+            except OSError as e:
+                app.logger.warning("Failed to start ffmpeg for HLS: %s", e)
+                self._hls = None
+                return False
+            self._hls = proc
+            self._hls_frames = queue.Queue(maxsize=HLS_QUEUE)
+            self._hls_writer = threading.Thread(
+                target=self._write_hls, args=(proc, self._hls_frames), daemon=True)
+            self._hls_writer.start()
+        return True
+
+    def stop_hls(self):
+        with self._lock:
+            proc, self._hls = self._hls, None
+            writer, self._hls_writer = self._hls_writer, None
+        if proc is None:
+            return
+        # The writer closes ffmpeg's stdin once it sees _hls change; if it is
+        # stuck in a write to a stalled encoder, killing ffmpeg unblocks it
+        if writer is not None and writer is not threading.current_thread():
+            writer.join(timeout=2)
+            if writer.is_alive():
+                proc.kill()
+        try:
+            proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    def _feed_hls(self, frame):
+        # Never block the capture thread (and with it every MJPEG viewer) on
+        # the encoder: when it falls behind, this frame is dropped for HLS only
+        frames = self._hls_frames
+        if self._hls is None or frames is None:
+            return
+        try:
+            frames.put_nowait(frame)
+        except queue.Full:
+            pass
+
+    def _write_hls(self, proc, frames):
+        """HLS writer thread: pipe queued frames into ffmpeg until stopped."""
+        try:
+            while self._hls is proc:
+                try:
+                    frame = frames.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                proc.stdin.write(np.ascontiguousarray(frame).data)
+        except (OSError, ValueError):
+            with self._lock:
+                if self._hls is not proc:
+                    return  # stop_hls killed it
+                self._hls = self._hls_writer = None
+            app.logger.warning("HLS encoder exited, stopping HLS output")
+            proc.kill()
+        finally:
+            try:
+                proc.stdin.close()
+            except (OSError, ValueError):
+                pass
+
+    def _publish(self, jpeg):
+        # joined straight from the encoder's array: one copy per frame, no
+        # tobytes() and no per-viewer concatenation
+        part = b"".join((_PART_PREFIX, jpeg, _PART_SUFFIX))
+        with self._cond:
+            self.frame_part = part
+            self.seq += 1
+            self._cond.notify_all()
+
+    def snapshot(self, timeout=2.0):
+        """Latest JPEG (waiting briefly for the first one), or None."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.frame_part is not None or not self.active, timeout=timeout)
+            part = self.frame_part
+        return part[len(_PART_PREFIX):-len(_PART_SUFFIX)] if part is not None else None
+
+    def frames(self):
+        """Yield each new multipart part until the camera is stopped. A viewer only ever
+        takes the newest frame, so a slow client skips frames instead of
+        building a backlog."""
+        seen = self.seq
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self.seq != seen or not self.active, timeout=1.0)
+                if not self.active:
+                    return
+                if self.seq == seen:
+                    continue
+                seen, part = self.seq, self.frame_part
+            yield part
+
+
+camera = CameraBroadcaster()
 
 
 @app.route("/start_camera", methods=["POST"])
 def start_camera():
-    """Start the camera (called from JS)."""
-    get_camera()
-    return {"status": "started"}
+    """Start the camera (called from JS). "hls" is the H.264 playlist URL when
+    ffmpeg is available, else null and the client uses /video_feed."""
+    camera.start()
+    hls = url_for("hls_stream", name="index.m3u8") if camera.start_hls() else None
+    return {"status": "started", "hls": hls}
 
 
 @app.route("/stop_camera", methods=["POST"])
 def stop_camera():
     """Stop the camera (called from JS)."""
-    stop_camera_instance()
+    camera.stop()
     return {"status": "stopped"}
 
 
 def gen_frames():
     """Yield camera frames for MJPEG stream. Exit cleanly when camera stopped."""
-    global camera, camera_active
-    cam = get_camera()
-    while True:
-        with camera_lock:
-            if not camera_active or cam is None:
-                break
-            ok, frame = cam.read()
-        if not ok or frame is None:
-            time.sleep(0.05)
-            continue
-        frame = cv2.resize(frame, (640, 360))
-        ret, buffer = cv2.imencode(".jpg", frame)
-        if not ret:
-            continue
-        frame_bytes = buffer.tobytes()
-        yield (b"--frame\r\n"
-               b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n")
+    camera.start()
+    yield from camera.frames()
 
 
 @app.route("/video_feed")
 def video_feed():
     # stream does not require login for dev; wrap if you want login-protected stream
+    if request.args.get("action") == "snapshot":
+        # Pull mode: one JPEG per request; the client asks for the next frame
+        # after drawing this one, so it is naturally rate-limited to its speed
+        camera.start()
+        jpeg = camera.snapshot()
+        if jpeg is None:
+            return Response(status=503)
+        return Response(jpeg, mimetype="image/jpeg", headers={"Cache-Control": "no-store"})
     return Response(gen_frames(), mimetype="multipart/x-mixed-replace; boundary=frame")
 
 
@@ -106,38 +323,224 @@ def video_feed():
 # -----------------------
 def ensure_attendance_file():
     if not os.path.exists(ATTENDANCE_FILE):
-        df = pd.DataFrame(columns=["Name", "Date", "Time"])
+        df = pd.DataFrame(columns=list(ATTENDANCE_COLS))
         df.to_csv(ATTENDANCE_FILE, index=False)
 
 
-def load_attendance(filters=None):
+def append_attendance(rows):
+    """Append Name/Date/Time rows to the CSV without reading or rewriting it."""
+    ensure_attendance_file()
+    with open(ATTENDANCE_FILE, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+    with open(ATTENDANCE_FILE, "a", newline="", encoding="utf-8") as f:
+        # a last line without newline (hand edit) would swallow the first new row
+        if size and last != b"\n":
+            f.write("\n")
+        rows.to_csv(f, header=False, index=False, lineterminator="\n")
+
+
+# The CSV is shared with the scanner and app.py, and every writer only appends
+# to it. Readers below keep an offset into it and parse just the bytes added
+# since their last call; a changed fingerprint before the offset means the file
+# was truncated or rewritten and they start over.
+CSV_FINGERPRINT = 64  # bytes before the consumed offset, to spot a rewritten file
+
+
+def _csv_tail(f, offset):
+    f.seek(max(0, offset - CSV_FINGERPRINT))
+    return f.read(offset - max(0, offset - CSV_FINGERPRINT)).decode("latin-1")
+
+
+def _read_appended(state, columns):
+    """Rows appended since state["offset"] as tuples of `columns` ("" where
+    absent), plus whether the file was reset and the rows cover all of it.
+    None if the CSV is unchanged. Updates state's key/offset/tail/cols."""
+    st = os.stat(ATTENDANCE_FILE)
+    key = [st.st_mtime_ns, st.st_size]  # size too: appends within one mtime tick
+    if state["key"] == key:
+        return None
+
+    old = state["key"]
+    with open(ATTENDANCE_FILE, "rb") as f:
+        start = state["offset"]
+        # Appends always grow the file and move mtime forward, so an older
+        # mtime (file restored) or a new mtime at the same size (in-place
+        # edit the fingerprint can miss) means re-reading from scratch
+        reset = (start > st.st_size or _csv_tail(f, start) != state["tail"]
+                 or (old is not None and (key[0] < old[0] or key[1] == old[1])))
+        if reset:
+            start = 0
+        f.seek(start)
+        chunk = f.read()
+        end = start + chunk.rfind(b"\n") + 1  # complete lines only
+        tail = _csv_tail(f, end)
+
+    reader = csv.reader(io.StringIO(chunk[:end - start].decode("utf-8", "replace")))
+    if start == 0:
+        header = next(reader, [])
+        state["cols"] = [header.index(c) if c in header else None for c in columns]
+    cols = state["cols"] or [None] * len(columns)
+    rows = [tuple(row[i] if i is not None and i < len(row) else "" for i in cols)
+            for row in reader if row]
+    state.update(key=key, offset=end, tail=tail)
+    return rows, reset or start == 0
+
+
+# /api/attendance counters, persisted so a restart resumes from the saved
+# offset instead of rescanning the whole file.
+_agg = None
+_agg_lock = threading.Lock()
+
+
+def _new_agg():
+    return {"key": None, "offset": 0, "tail": "", "cols": None, "by_date": {}, "names": {}}
+
+
+def attendance_aggregates():
+    """Per-date and per-name record counts, brought up to date with the CSV."""
+    global _agg
+    ensure_attendance_file()
+    with _agg_lock:
+        if _agg is None:
+            try:
+                with open(ATTENDANCE_AGG, encoding="utf-8") as f:
+                    _agg = json.load(f)
+            except (OSError, ValueError):
+                _agg = _new_agg()
+            if not isinstance(_agg, dict) or _agg.keys() != _new_agg().keys():
+                _agg = _new_agg()  # partial/foreign file: recount
+        new = _read_appended(_agg, ("Name", "Date"))
+        if new is None:
+            return _agg
+
+        rows, reset = new
+        if reset:
+            _agg["by_date"], _agg["names"] = {}, {}  # recount
+        by_date, names = _agg["by_date"], _agg["names"]
+        for name, d in rows:
+            names[name] = names.get(name, 0) + 1
+            if d:
+                by_date[d] = by_date.get(d, 0) + 1
+
+        try:
+            tmp = ATTENDANCE_AGG + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(_agg, f)
+            os.replace(tmp, ATTENDANCE_AGG)
+        except OSError as e:
+            app.logger.warning("Could not save %s: %s", ATTENDANCE_AGG, e)
+        return _agg
+
+
+# Scanner and app.py write %d-%m-%Y; the rest are for hand-edited/uploaded rows,
+# with ISO datetimes and pandas' dayfirst inference as last resorts.
+# Filters come from <input type="date"> (ISO).
+DATE_FORMATS = ("%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d", "%d.%m.%Y")
+FILTER_DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y")
+
+
+@lru_cache(maxsize=4096)
+def parse_date(s, formats=DATE_FORMATS):
+    """Day ordinal of a date string, or None. Parsed once per distinct string."""
+    s = s.strip()
+    if not s:
+        return None
+    for fmt in formats:
+        try:
+            return datetime.strptime(s, fmt).toordinal()
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(s).toordinal()  # e.g. "2025-02-10 09:00:00"
+    except ValueError:
+        pass
+    parsed = pd.to_datetime(s, dayfirst=True, errors="coerce")  # e.g. "10 Feb 2025"
+    return None if pd.isna(parsed) else parsed.toordinal()
+
+
+# Attendance rows as plain tuples, no DataFrame. "rows" is file order and only
+# grows by the newly appended lines; the sorted views are rebuilt from it when
+# it changes (Timsort, so mostly-ordered data sorts in ~linear time).
+_records = {"key": None, "offset": 0, "tail": "", "cols": None,
+            "rows": [], "sorted": [], "lower": [], "keys": []}
+_records_lock = threading.Lock()
+
+
+def _cached_attendance():
+    """(records, lower, keys): (Name, Date, Time) tuples newest first (undated
+    rows last), their lower-cased names, and the negated day ordinals of the
+    dated prefix (ascending, for bisect)."""
     ensure_attendance_file()
-    df = pd.read_csv(ATTENDANCE_FILE)
-    df["Name"] = df["Name"].fillna("")
-    df["DateObj"] = pd.to_datetime(df["Date"], dayfirst=True, errors="coerce")
+    with _records_lock:
+        new = _read_appended(_records, ATTENDANCE_COLS)
+        if new is not None:
+            rows, reset = new
+            if reset:
+                _records["rows"] = []
+            _records["rows"].extend((n, d, t, parse_date(d)) for n, d, t in rows)
+            if rows or reset:
+                all_rows = _records["rows"]
+                dated = sorted((r for r in all_rows if r[3] is not None),
+                               key=lambda r: (r[3], r[2]), reverse=True)
+                undated = sorted((r for r in all_rows if r[3] is None),
+                                 key=lambda r: r[2], reverse=True)
+                ordered = [r[:3] for r in dated + undated]
+                _records.update(sorted=ordered,
+                                lower=[r[0].lower() for r in ordered],
+                                keys=[-r[3] for r in dated])
+        return _records["sorted"], _records["lower"], _records["keys"]
+
+
+def load_attendance(filters=None):
+    """Filtered (Name, Date, Time) tuples, newest first. Treat as read-only:
+    unfiltered calls get the cached list itself."""
+    records, lower, keys = _cached_attendance()
 
     if filters:
         name = filters.get("name", "").strip()
         date_from = filters.get("date_from", "").strip()
         date_to = filters.get("date_to", "").strip()
 
-        if name:
-            df = df[df["Name"].str.contains(name, case=False, na=False)]
-
+        # Date range -> one contiguous slice of the date-sorted list (binary
+        # search), so the name match only scans rows inside the range
+        start, stop = 0, len(records)
         if date_from:
-            try:
-                df = df[df["DateObj"] >= pd.to_datetime(date_from)]
-            except:
-                pass
+            day = parse_date(date_from, FILTER_DATE_FORMATS)
+            if day is not None:
+                stop = bisect.bisect_right(keys, -day)
 
         if date_to:
-            try:
-                df = df[df["DateObj"] <= pd.to_datetime(date_to)]
-            except:
-                pass
+            day = parse_date(date_to, FILTER_DATE_FORMATS)
+            if day is not None:
+                start = bisect.bisect_left(keys, -day)
+                stop = min(stop, len(keys))
 
-    df = df.sort_values(by=["DateObj", "Time"], ascending=[False, False])
-    return df.drop(columns=["DateObj"])
+        if name:
+            name = name.lower()
+            return [r for r, n in zip(records[start:stop], lower[start:stop]) if name in n]
+        if (start, stop) != (0, len(records)):
+            return records[start:stop]
+
+    return records
+
+
+def paginate(records):
+    """Slice one page (?page=N&page_size=M, 1-based) of already filtered and
+    sorted records; only that slice is turned into dicts."""
+    page_size = min(max(request.args.get("page_size", PAGE_SIZE, type=int) or PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    pages = max(1, -(-len(records) // page_size))
+    page = min(max(request.args.get("page", 1, type=int) or 1, 1), pages)
+    start = (page - 1) * page_size
+    return {
+        "records": [dict(zip(ATTENDANCE_COLS, r)) for r in records[start:start + page_size]],
+        "page": page,
+        "page_size": page_size,
+        "pages": pages,
+    }
 
 
 # -----------------------
@@ -160,7 +563,10 @@ def login():
     if request.method == "POST":
         u = request.form.get("username", "").strip()
         p = request.form.get("password", "").strip()
-        if u == ADMIN_USER and p == ADMIN_PASS:
+        # both checks always run (&, not and) so timing doesn't reveal which failed
+        user_ok = hmac.compare_digest(u.encode(), ADMIN_USER.encode())
+        pass_ok = hmac.compare_digest(hashlib.sha256(p.encode()).digest(), ADMIN_PASS_HASH)
+        if user_ok & pass_ok:
             session["logged_in"] = True
             session["username"] = u
             return redirect(url_for("dashboard"))
@@ -172,10 +578,23 @@ def login():
 @app.route("/logout")
 def logout():
     session.clear()
-    stop_camera_instance()
+    camera.stop()
     return redirect(url_for("login"))
 
 
+# -----------------------
+# ROUTES: HLS
+# -----------------------
+@app.route("/hls/<path:name>")
+@login_required
+def hls_stream(name):
+    if not camera.start_hls():
+        abort(404)
+    camera.start()
+    # Playlist changes every segment; segments themselves are immutable
+    return send_from_directory(HLS_DIR, name, max_age=0 if name.endswith(".m3u8") else 60)
+
+
 # -----------------------
 # ROUTES: DASHBOARD
 # -----------------------
@@ -187,11 +606,15 @@ def dashboard():
         "date_from": request.args.get("date_from", ""),
         "date_to": request.args.get("date_to", "")
     }
-    df = load_attendance(filters)
+    records = load_attendance(filters)
+    pg = paginate(records)
     return render_template(
         "dashboard.html",
-        data=df.to_dict(orient="records"),
-        total_records=len(df),
+        data=pg["records"],
+        total_records=len(records),
+        page=pg["page"],
+        page_size=pg["page_size"],
+        pages=pg["pages"],
         filter_name=filters["name"],
         filter_date_from=filters["date_from"],
         filter_date_to=filters["date_to"],
@@ -200,6 +623,21 @@ def dashboard():
     )
 
 
+@app.route("/api/records")
+@login_required
+def api_records():
+    """Same filters + ?page=N&page_size=M as the dashboard, as JSON (for AJAX paging)."""
+    filters = {
+        "name": request.args.get("name", ""),
+        "date_from": request.args.get("date_from", ""),
+        "date_to": request.args.get("date_to", "")
+    }
+    records = load_attendance(filters)
+    pg = paginate(records)
+    pg["total_records"] = len(records)
+    return jsonify(pg)
+
+
 # -----------------------
 # EXPORT: EXCEL
 # -----------------------
@@ -211,16 +649,54 @@ def export_excel():
         "date_from": request.args.get("date_from", ""),
         "date_to": request.args.get("date_to", "")
     }
-    df = load_attendance(filters)
+    records = load_attendance(filters)
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Attendance")
+    # xlsxwriter directly, values only: skips pandas' per-cell ExcelFormatter.
+    # Rows go out in order, so constant_memory can flush each one as written.
+    wb = xlsxwriter.Workbook(output, {"constant_memory": True})
+    ws = wb.add_worksheet("Attendance")
+    ws.write_row(0, 0, ATTENDANCE_COLS)
+    for i, row in enumerate(records, 1):
+        ws.write_row(i, 0, row)
+    wb.close()
     output.seek(0)
     fname = f"attendance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
     return send_file(output, as_attachment=True, download_name=fname,
                      mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
 
+# -----------------------
+# EXPORT: CSV
+# -----------------------
+@app.route("/export/csv")
+@login_required
+def export_csv():
+    filters = {
+        "name": request.args.get("name", ""),
+        "date_from": request.args.get("date_from", ""),
+        "date_to": request.args.get("date_to", "")
+    }
+    records = load_attendance(filters)
+
+    def generate():
+        # header, then CSV_EXPORT_CHUNK rows at a time: the download starts
+        # immediately and only one chunk of text is built at once
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(ATTENDANCE_COLS)
+        for start in range(0, len(records), CSV_EXPORT_CHUNK):
+            writer.writerows(records[start:start + CSV_EXPORT_CHUNK])
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+
+    fname = f"attendance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return Response(generate(), mimetype="text/csv",
+                    headers={"Content-Disposition": f"attachment; filename={fname}"})
+
+
 # -----------------------
 # BULK UPLOAD
 # -----------------------
@@ -235,15 +711,21 @@ def upload_attendance():
         fname = file.filename.lower()
         if fname.endswith(".xlsx") or fname.endswith(".xls"):
             new_df = pd.read_excel(file)
+        elif pacsv is not None:
+            # pyarrow's multithreaded reader; keep the columns as text like pd.read_csv
+            table = pacsv.read_csv(file.stream, convert_options=pacsv.ConvertOptions(
+                column_types={c: pa.string() for c in ("Name", "Date", "Time")}))
+            new_df = table.to_pandas()
         else:
             new_df = pd.read_csv(file)
         if not {"Name", "Date", "Time"}.issubset(set(new_df.columns)):
             flash("File must contain Name, Date, Time", "error")
             return redirect(url_for("dashboard"))
-        ensure_attendance_file()
-        old = pd.read_csv(ATTENDANCE_FILE)
-        merged = pd.concat([old, new_df[["Name", "Date", "Time"]]], ignore_index=True)
-        merged.to_csv(ATTENDANCE_FILE, index=False)
+        rows = new_df[list(ATTENDANCE_COLS)].copy()
+        # Excel date cells arrive as datetimes; store them like every other writer
+        rows["Date"] = rows["Date"].map(
+            lambda v: v.strftime("%d-%m-%Y") if isinstance(v, datetime) and not pd.isna(v) else v)
+        append_attendance(rows)
         flash(f"Uploaded {len(new_df)} records", "success")
     except Exception as e:
         flash(f"Upload error: {e}", "error")
@@ -256,16 +738,39 @@ def upload_attendance():
 @app.route("/api/attendance")
 @login_required
 def api_attendance():
-    df = load_attendance()
-    # return aggregated counts per date and top names
-    by_date = df.groupby("Date").size().reset_index(name="count").to_dict(orient="records")
-    top_names = df["Name"].value_counts().head(10).reset_index().rename(columns={"index":"Name", "Name":"count"}).to_dict(orient="records")
-    return jsonify({"by_date": by_date, "top_names": top_names})
+    # Chart polling: same CSV version as the client's copy -> 304, nothing computed
+    ensure_attendance_file()
+    st = os.stat(ATTENDANCE_FILE)
+    etag = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        # Served from the incrementally maintained counters, no pandas
+        agg = attendance_aggregates()
+        # return aggregated counts per date and top names
+        by_date = [{"Date": d, "count": c} for d, c in sorted(agg["by_date"].items())]
+        top_names = [{"Name": n, "count": c}
+                     for n, c in heapq.nlargest(10, agg["names"].items(), key=lambda kv: kv[1])]
+        resp = jsonify({"by_date": by_date, "top_names": top_names})
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, must-revalidate"
+    return resp
 
 
 # -----------------------
 # START SERVER
 # -----------------------
+# Production: gunicorn -c gunicorn.conf.py web_dashboard:app  (Linux/macOS)
+# Running this file directly uses waitress when installed (Windows), else the
+# threaded dev server. Each MJPEG viewer holds a thread for as long as it watches.
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", 16))
+
 if __name__ == "__main__":
     ensure_attendance_file()
-    app.run(host="0.0.0.0", port=5000, debug=False)
+    port = int(os.environ.get("PORT", 5000))
+    try:
+        from waitress import serve
+    except ImportError:
+        app.run(host="0.0.0.0", port=port, debug=False, threaded=True)
+    else:
+        serve(app, host="0.0.0.0", port=port, threads=SERVER_THREADS)